@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memoized Arabic Shaping
+Created: 2025-02-21 09:35:18
+Author: x9ci
+"""
+# arabic_shaping.py
+
+import logging
+from functools import lru_cache
+from typing import Dict
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+
+# عدد النصوص المشكلة المحفوظة في الذاكرة
+SHAPING_CACHE_SIZE = 20000
+
+# مشكل واحد مشترك يهيأ مرة واحدة لكل العملية
+_reshaper = arabic_reshaper.ArabicReshaper()
+
+
+@lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def _shape_cached(text: str) -> str:
+    return get_display(_reshaper.reshape(text))
+
+
+def shape_arabic_text(text: str) -> str:
+    """تشكيل النص العربي وترتيبه للعرض (إعادة التشكيل ثم BIDI) مع حفظ النتائج"""
+    if not text:
+        return text
+    try:
+        return _shape_cached(text)
+    except Exception as e:
+        logging.error(f"خطأ في معالجة النص العربي: {str(e)}")
+        return text
+
+
+def shaping_stats() -> Dict:
+    """إحصائيات ذاكرة التشكيل"""
+    info = _shape_cached.cache_info()
+    total = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': info.hits / total if total else 0.0,
+        'entries': info.currsize,
+        'max_entries': info.maxsize
+    }
+
+
+def clear_shaping_cache():
+    """تفريغ ذاكرة التشكيل"""
+    _shape_cached.cache_clear()
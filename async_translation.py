@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Translation Engine
+Created: 2025-02-06 11:40:18
+Author: x9ci
+"""
+# async_translation.py
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+REQUESTS_METRIC = REGISTRY.counter('translation_requests_total', "طلبات الترجمة المرسلة إلى المحرك")
+RETRIES_METRIC = REGISTRY.counter('translation_retries_total', "إعادة محاولات طلبات الترجمة")
+FAILURES_METRIC = REGISTRY.counter('translation_failures_total', "طلبات الترجمة الفاشلة نهائياً")
+REQUEST_SECONDS = REGISTRY.histogram('translation_request_seconds', "زمن طلب الترجمة الواحد")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """هل الخطأ مؤقت (429 أو 5xx أو خطأ اتصال) يستحق إعادة المحاولة"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or 500 <= status < 600
+
+    name = type(error).__name__
+    if isinstance(error, (ConnectionError, TimeoutError)) or 'Timeout' in name or 'Connect' in name:
+        return True
+
+    return bool(re.search(r'\b(429|5\d\d)\b', str(error)))
+
+
+def backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 30.0) -> float:
+    """تأخير أسي مع تشويش كامل"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def run_coroutine(coro):
+    """تشغيل coroutine من شيفرة متزامنة"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # داخل حلقة أحداث قائمة: التشغيل في خيط منفصل
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class TokenBucket:
+    """محدد معدل بدلو الرموز، مشترك بين الخيوط وحلقات الأحداث"""
+
+    def __init__(self, rate: float = 2.0, capacity: float = 2.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """حجز رموز وإرجاع مدة الانتظار اللازمة"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire_sync(self, tokens: float = 1.0):
+        """انتظار الرموز بشكل متزامن"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire(self, tokens: float = 1.0):
+        """انتظار الرموز داخل حلقة الأحداث"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AsyncTranslationEngine:
+    """تنفيذ طلبات الترجمة بالتوازي مع حد للطلبات الجارية وإعادة المحاولة"""
+
+    def __init__(self, max_in_flight: int = 4, rate_limiter: TokenBucket = None,
+                 max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.logger = logging.getLogger(__name__)
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        # حد واحد لجميع حلقات الأحداث والخيوط التي تستخدم المحرك (asyncio.Semaphore مرتبطة بحلقتها)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+
+    def _call_in_slot(self, func, *args):
+        """تنفيذ الطلب في خيطه بعد حجز مكان من الحد المشترك"""
+        with self._slots:
+            with REQUEST_SECONDS.time():
+                return func(*args)
+
+    async def call(self, func, *args):
+        """استدعاء دالة ترجمة متزامنة في خيط مع التحديد وإعادة المحاولة"""
+        for attempt in range(self.max_attempts):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            try:
+                self.requests += 1
+                REQUESTS_METRIC.inc()
+                return await asyncio.to_thread(self._call_in_slot, func, *args)
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not is_retryable_error(e):
+                    self.failures += 1
+                    FAILURES_METRIC.inc()
+                    raise
+                self.retries += 1
+                RETRIES_METRIC.inc()
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                self.logger.warning(
+                    f"خطأ مؤقت في الترجمة ({str(e)})، إعادة المحاولة بعد {delay:.2f} ثانية"
+                )
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """إحصائيات الطلبات"""
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures
+        }
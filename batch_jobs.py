@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Translation of Many PDF Files
+Created: 2025-02-24 09:12:44
+Author: x9ci
+"""
+# batch_jobs.py
+
+import copy
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from async_translation import TokenBucket
+from translation_cache import TranslationMemory
+
+
+def is_batch_source(source: str) -> bool:
+    """المدخل مجلد أو نمط glob وليس ملفاً واحداً
+
+    الملف الموجود يبقى ملفاً واحداً حتى لو احتوى اسمه على أحرف glob مثل
+    "book [2nd ed].pdf".
+    """
+    path = Path(source)
+    if path.is_file():
+        return False
+    return path.is_dir() or glob.has_magic(source)
+
+
+def output_paths(files: List[Path], output_dir) -> Dict[Path, Path]:
+    """مسار إخراج لكل ملف يحفظ مجلده النسبي داخل مجلد الإخراج
+
+    الملفات المتشابهة الأسماء في مجلدات مختلفة (من glob متكرر) لا يكتب
+    بعضها فوق بعض.
+    """
+    if not files:
+        return {}
+    root = Path(os.path.commonpath([str(path.parent) for path in files]))
+    return {
+        path: Path(output_dir) / path.parent.relative_to(root) / f"translated_{path.stem}.pdf"
+        for path in files
+    }
+
+
+def collect_input_files(source: str) -> List[Path]:
+    """ملفات PDF من مجلد أو نمط glob مرتبة من الأكبر حجماً إلى الأصغر"""
+    path = Path(source)
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(source, recursive=True))
+
+    files = {p.resolve() for p in candidates if p.is_file() and p.suffix.lower() == '.pdf'}
+    # الملفات الكبيرة أولاً حتى لا يبقى ملف طويل وحده في نهاية الدفعة
+    return sorted(files, key=lambda p: (-p.stat().st_size, str(p)))
+
+
+class BatchTranslator:
+    """ترجمة مجموعة ملفات بمجمع عمال يتشارك ذاكرة ترجمة واحدة ومحدد معدل واحد"""
+
+    def __init__(self, config, handler_factory: Callable, jobs: int = 2):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.handler_factory = handler_factory
+        self.jobs = max(1, jobs)
+        self.translation_memory = TranslationMemory(
+            config.TRANSLATION_MEMORY_PATH,
+            max_entries=config.TRANSLATION_MEMORY_MAX_ENTRIES
+        )
+        # حصة الطلبات للدفعة كاملة وليست لكل ملف
+        self.rate_limiter = TokenBucket(config.REQUESTS_PER_SECOND, config.RATE_LIMIT_BURST)
+        self.job_config = config
+
+    def worker_config(self, concurrent_jobs: int):
+        """إعدادات الملف الواحد عندما تعالج صفحاته في عمليات عاملة
+
+        محدد المعدل المشترك لا يعبر حدود العمليات، وكل عملية عاملة تنشئ محدداً
+        بحصة REQUESTS_PER_SECOND مقسومة على عدد العمليات. لذلك يعطى كل ملف
+        حصته من معدل الدفعة حتى لا يتجاوز المجموع الحد المسموح.
+        """
+        if concurrent_jobs <= 1 or getattr(self.config, 'PARALLEL_WORKERS', 1) <= 1:
+            return self.config
+        config = copy.copy(self.config)
+        config.REQUESTS_PER_SECOND = self.config.REQUESTS_PER_SECOND / concurrent_jobs
+        return config
+
+    def run(self, files: List[Path], resume: bool = False) -> Dict:
+        """تشغيل جميع الملفات وإرجاع تقرير الدفعة"""
+        started = time.perf_counter()
+        results = []
+        outputs = output_paths(files, self.config.OUTPUT_DIR)
+        if files:
+            concurrent_jobs = min(self.jobs, len(files))
+            self.job_config = self.worker_config(concurrent_jobs)
+            self.logger.info(f"ترجمة دفعة من {len(files)} ملف باستخدام {concurrent_jobs} عامل")
+            with ThreadPoolExecutor(max_workers=concurrent_jobs, thread_name_prefix="batch") as executor:
+                futures = [executor.submit(self.run_job, path, resume, outputs[path]) for path in files]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    if result['status'] == 'ok':
+                        self.logger.info(f"اكتمل {result['input']} في {result['seconds']:.1f} ث")
+                    else:
+                        self.logger.error(f"فشل {result['input']}: {result['error']}")
+
+        order = {str(path): i for i, path in enumerate(files)}
+        results.sort(key=lambda r: order[r['input']])
+        return {
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'jobs': self.jobs,
+            'files': len(files),
+            'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+            'failed': sum(1 for r in results if r['status'] != 'ok'),
+            'total_seconds': round(time.perf_counter() - started, 3),
+            'translation_memory': self.translation_memory.stats(),
+            'results': results
+        }
+
+    def run_job(self, path: Path, resume: bool = False, output_path: Path = None) -> Dict:
+        """ترجمة ملف واحد بمكونات خاصة به وذاكرة ومحدد معدل مشتركين"""
+        if output_path is None:
+            output_path = Path(self.config.OUTPUT_DIR) / f"translated_{path.stem}.pdf"
+        result = {
+            'input': str(path),
+            'output': str(output_path),
+            'size_bytes': path.stat().st_size,
+            'status': 'ok',
+            'error': None
+        }
+        started = time.perf_counter()
+        try:
+            handler = self.handler_factory(
+                self.job_config, 1,
+                translation_memory=self.translation_memory,
+                rate_limiter=self.rate_limiter
+            )
+            handler.translate_pdf(str(path), resume=resume, output_path=output_path)
+            result['stats'] = handler.run_stats
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        return result
+
+    def write_report(self, report: Dict, report_path) -> Path:
+        """حفظ تقرير الدفعة بصيغة JSON"""
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = report_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, report_path)
+        return report_path
+
+    def close(self):
+        self.translation_memory.close()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Translation Helpers
+Created: 2025-02-04 16:22:05
+Author: x9ci
+"""
+# batch_translation.py
+
+from typing import List, Optional, Tuple
+
+# فاصل الأسطر يبقى سليماً بعد الترجمة، والنصوص المنظفة لا تحتوي عليه
+BATCH_SEPARATOR = '\n'
+MAX_REQUEST_CHARS = 4500
+
+
+def split_text_into_chunks(text: str, max_length: int = 1000) -> List[str]:
+    """تقسيم النص الطويل إلى أجزاء أصغر"""
+    if len(text) <= max_length:
+        return [text]
+
+    chunks = []
+    while text:
+        # محاولة تقسيم النص عند نقطة مناسبة
+        if len(text) <= max_length:
+            chunks.append(text)
+            break
+
+        # البحث عن نقطة نهاية الجملة (مع إبقاء النقطة في الجزء الأول)
+        split_point = text.rfind('.', 0, max_length - 1) + 1
+        if split_point <= 0:
+            # إذا لم يتم العثور على نقطة، البحث عن مسافة
+            split_point = text.rfind(' ', 0, max_length)
+        if split_point <= 0:
+            # إذا لم يتم العثور على مسافة، التقسيم عند الحد الأقصى
+            split_point = max_length
+
+        chunk = text[:split_point].strip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[split_point:].strip()
+
+    return chunks
+
+
+def pack_requests(texts: List[str], max_chars: int = MAX_REQUEST_CHARS,
+                  max_items: int = None) -> List[List[Tuple[int, str]]]:
+    """تجميع النصوص في طلبات لا يتجاوز كل منها حد الأحرف أو عدد الأجزاء
+
+    كل طلب قائمة من (فهرس النص، جزء النص)؛ النصوص الطويلة تُقسم أولاً.
+    """
+    requests = []
+    current = []
+    current_len = 0
+
+    for index, text in enumerate(texts):
+        for chunk in split_text_into_chunks(text, max_chars):
+            added_len = len(chunk) + (len(BATCH_SEPARATOR) if current else 0)
+            if current and (current_len + added_len > max_chars or
+                            (max_items and len(current) >= max_items)):
+                requests.append(current)
+                current = []
+                current_len = 0
+                added_len = len(chunk)
+            current.append((index, chunk))
+            current_len += added_len
+
+    if current:
+        requests.append(current)
+
+    return requests
+
+
+def split_response(response: str, request: list) -> Optional[List[str]]:
+    """تقسيم نص الترجمة إلى أجزائه، أو None إذا لم يتطابق العدد"""
+    parts = [part.strip() for part in (response or '').split(BATCH_SEPARATOR)]
+    parts = [part for part in parts if part]
+    if len(parts) != len(request):
+        return None
+    return parts
+
+
+def merge_chunks(count: int, pieces: List[Tuple[int, str]]) -> List[Optional[str]]:
+    """إعادة تجميع أجزاء الترجمة حسب فهرس النص الأصلي
+
+    None في جزء أو في النتيجة تعني فشل الترجمة، وتميز عن السلسلة الفارغة.
+    """
+    merged = [[] for _ in range(count)]
+    failed = set()
+    for index, piece in pieces:
+        if piece is None:
+            # فشل أي جزء يعني فشل النص كاملاً
+            failed.add(index)
+        elif piece:
+            merged[index].append(piece)
+    return [None if index in failed else ' '.join(parts) for index, parts in enumerate(merged)]
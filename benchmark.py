@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-End Translation Benchmark
+Created: 2025-02-24 14:31:06
+Author: x9ci
+"""
+# benchmark.py
+
+import argparse
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+BASE_DIR = Path(__file__).parent
+
+WORDS = (
+    "the position after white castles queenside black must defend the weak pawn on "
+    "the open file while the knight returns to cover the centre and both players "
+    "prepare a long endgame with rooks and opposite coloured bishops where every "
+    "tempo matters because the king becomes active and the passed pawn decides"
+).split()
+
+PIECES = ['', '', '', 'N', 'B', 'R', 'Q', 'K']
+FILES = 'abcdefgh'
+
+STAGES = ('extraction', 'translation', 'shaping', 'placement', 'rendering', 'merge')
+
+
+def random_sentence(rng: random.Random, words: int) -> str:
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def random_move(rng: random.Random) -> str:
+    move = rng.choice(PIECES) + rng.choice(FILES) + str(rng.randint(1, 8))
+    return move + ('+' if rng.random() < 0.08 else '')
+
+
+def write_dense_text(path: Path, pages: int, lines_per_page: int = 46, seed: int = 1):
+    """صفحات نصية كثيفة بفقرات متتالية"""
+    rng = random.Random(seed)
+    c = canvas.Canvas(str(path), pagesize=letter)
+    for _ in range(pages):
+        c.setFont('Helvetica', 10)
+        y = 750
+        for line in range(lines_per_page):
+            if line % 8 == 7:
+                y -= 6  # فاصل بين الفقرات
+            c.drawString(50, y, random_sentence(rng, 13)[:95])
+            y -= 15
+        c.showPage()
+    c.save()
+
+
+def write_chess_moves(path: Path, pages: int, seed: int = 2):
+    """قوائم نقلات شطرنج مع تعليقات قصيرة بينها"""
+    rng = random.Random(seed)
+    c = canvas.Canvas(str(path), pagesize=letter)
+    move_number = 1
+    for page in range(pages):
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(50, 750, f"Game {page + 1}: Player {rng.randint(1, 99)} - Player {rng.randint(1, 99)}")
+        c.setFont('Helvetica', 10)
+        y = 725
+        while y > 60:
+            if rng.random() < 0.3:
+                moves = f"{move_number}.{random_move(rng)} {random_move(rng)}"
+                c.drawString(50, y, f"After {moves} {random_sentence(rng, 8)}")
+                move_number += 1
+            else:
+                moves = []
+                for _ in range(4):
+                    moves.append(f"{move_number}. {random_move(rng)} {random_move(rng)}")
+                    move_number += 1
+                c.drawString(50, y, ' '.join(moves))
+            y -= 15
+            if move_number > 60:
+                move_number = 1
+        c.showPage()
+    c.save()
+
+
+def write_multi_column(path: Path, pages: int, seed: int = 3):
+    """صفحات بعمودين من الفقرات"""
+    rng = random.Random(seed)
+    c = canvas.Canvas(str(path), pagesize=letter)
+    for _ in range(pages):
+        c.setFont('Helvetica', 9)
+        for x in (50, 320):
+            y = 750
+            while y > 60:
+                for _ in range(rng.randint(3, 6)):
+                    c.drawString(x, y, random_sentence(rng, 7)[:48])
+                    y -= 12
+                y -= 10
+        c.showPage()
+    c.save()
+
+
+def write_large_book(path: Path, pages: int, seed: int = 4):
+    """كتاب طويل بنص متوسط الكثافة"""
+    write_dense_text(path, pages, lines_per_page=18, seed=seed)
+
+
+CORPUS = {
+    'dense_text': (write_dense_text, 100),
+    'chess_moves': (write_chess_moves, 100),
+    'multi_column': (write_multi_column, 100),
+    'large_book': (write_large_book, 1000),
+}
+
+
+def generate_corpus(corpus_dir: Path, scale: float = 1.0, only: List[str] = None) -> Dict[str, Path]:
+    """إنشاء ملفات المجموعة الاصطناعية (تعاد استخدامها إذا كانت موجودة)"""
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name, (writer, pages) in CORPUS.items():
+        if only and name not in only:
+            continue
+        pages = max(1, int(pages * scale))
+        path = corpus_dir / f"{name}_{pages}.pdf"
+        if not path.exists():
+            logging.info(f"إنشاء {path.name}")
+            writer(path, pages)
+        files[name] = path
+    return files
+
+
+class StageTimer:
+    """تجميع زمن الاستدعاءات لكل مرحلة (أزمنة شاملة تتداخل مع المراحل الداخلية)"""
+
+    def __init__(self):
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.calls = {stage: 0 for stage in STAGES}
+        self.lock = threading.Lock()
+        self.patched = []
+
+    def record(self, stage: str, elapsed: float):
+        with self.lock:
+            self.seconds[stage] += elapsed
+            self.calls[stage] += 1
+
+    def wrap(self, owner, attr: str, stage: str):
+        """استبدال دالة بنسخة تقيس زمنها (على كائن أو صنف أو وحدة)"""
+        original = getattr(owner, attr)
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+        # دوال الكائن تأتي من صنفه: عند الاستعادة يكفي حذف النسخة المضافة
+        self.patched.append((owner, attr, original if attr in vars(owner) else None))
+        setattr(owner, attr, timed)
+
+    def restore(self):
+        for owner, attr, original in reversed(self.patched):
+            if original is None:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+        self.patched = []
+
+    def report(self, wall_seconds: float) -> Dict:
+        return {
+            stage: {
+                'seconds': round(self.seconds[stage], 4),
+                'calls': self.calls[stage],
+                'share_of_wall': round(self.seconds[stage] / wall_seconds, 4) if wall_seconds else 0.0
+            }
+            for stage in STAGES
+        }
+
+
+def instrument(timer: StageTimer, tran_module, handler):
+    """ربط المراحل بدوال المعالجة في هذه العملية"""
+    page_processor = handler.page_processor
+    timer.wrap(handler, 'extract_page_content', 'extraction')
+    timer.wrap(page_processor.text_processor, 'translate_texts_async', 'translation')
+    timer.wrap(tran_module, 'shape_arabic_text', 'shaping')
+    timer.wrap(page_processor, 'find_optimal_position', 'placement')
+    timer.wrap(page_processor, 'create_translated_overlay', 'rendering')
+    timer.wrap(handler, 'add_page_with_overlay', 'merge')
+    timer.wrap(tran_module.PdfWriter, 'write', 'merge')
+
+
+def run_scenario(name: str, pdf_path: str, work_dir: str, options: Dict) -> Dict:
+    """تشغيل ملف واحد عبر خط المعالجة كاملاً بمترجم وهمي (داخل عملية مستقلة)"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import tran
+        from low_memory import peak_rss_mb
+        logging.getLogger().setLevel(logging.WARNING)
+
+        config = tran.PDFTranslatorConfig()
+        work_dir = Path(work_dir)
+        config.OUTPUT_DIR = work_dir / "output"
+        config.TRANSLATION_MEMORY_PATH = work_dir / "memory.sqlite3"
+        config.JOURNAL_DIR = work_dir / "journal"
+        config.PAGE_STORE_DIR = work_dir / "pages"
+        config.TRANSLATION_BACKEND = 'fake'
+        config.TRANSLATION_BACKEND_OPTIONS = {'latency': options.get('latency', 0.0)}
+        config.REQUESTS_PER_SECOND = 0  # بدون تحديد معدل: نقيس المعالجة لا الانتظار
+        config.INCREMENTAL_ENABLED = False
+        config.OCR_ENABLED = False
+        config.PARALLEL_WORKERS = options.get('workers', 1)
+        config.PIPELINE_ENABLED = options.get('pipeline', True)
+        config.LOW_MEMORY_MODE = options.get('low_memory', False)
+
+        handler = tran.create_pdf_handler(config, config.PARALLEL_WORKERS)
+        handler.create_progress_bar = lambda total_pages: None
+        timer = StageTimer()
+        instrument(timer, tran, handler)
+        start = time.perf_counter()
+        try:
+            handler.translate_pdf(pdf_path)
+        finally:
+            wall_seconds = time.perf_counter() - start
+            timer.restore()
+
+    pages = _page_count(pdf_path)
+    peak_rss = peak_rss_mb()
+    output_path = Path(config.OUTPUT_DIR) / f"translated_{Path(pdf_path).stem}.pdf"
+    return {
+        'name': name,
+        'pages': pages,
+        'input_bytes': os.path.getsize(pdf_path),
+        'output_bytes': output_path.stat().st_size if output_path.exists() else None,
+        'wall_seconds': round(wall_seconds, 4),
+        'pages_per_second': round(pages / wall_seconds, 3) if wall_seconds else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'stages': timer.report(wall_seconds),
+        'backend_requests': getattr(handler.page_processor.text_processor.backend, 'requests', None),
+        'translation_chars': tran.CHARS_SENT_METRIC.value,
+        'notation_chars_masked': tran.NOTATION_CHARS_METRIC.value,
+        'run_stats': handler.run_stats
+    }
+
+
+def _page_count(pdf_path: str) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(pdf_path).pages)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=str(BASE_DIR),
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmarks(files: Dict[str, Path], options: Dict) -> Dict:
+    """تشغيل كل ملف في عملية جديدة حتى تكون ذروة الذاكرة خاصة به"""
+    scenarios = []
+    context = get_context('spawn')
+    for name, path in files.items():
+        with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_scenario, name, str(path), work_dir, options).result()
+        scenarios.append(result)
+        logging.info(
+            f"{name}: {result['pages']} صفحة في {result['wall_seconds']:.2f} ث "
+            f"({result['pages_per_second']} صفحة/ث، ذروة الذاكرة {result['peak_rss_mb']} MB)"
+        )
+    return {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': options,
+        'scenarios': scenarios
+    }
+
+
+def print_summary(results: Dict, printer: Callable = print):
+    printer(f"\n{'scenario':<14}{'pages':>7}{'sec':>9}{'p/s':>8}{'MB':>8}  " +
+            ''.join(f"{stage:>12}" for stage in STAGES))
+    for scenario in results['scenarios']:
+        stages = ''.join(f"{scenario['stages'][stage]['seconds']:>12.2f}" for stage in STAGES)
+        printer(f"{scenario['name']:<14}{scenario['pages']:>7}{scenario['wall_seconds']:>9.2f}"
+                f"{scenario['pages_per_second'] or 0:>8.1f}{scenario['peak_rss_mb'] or 0:>8.0f}  {stages}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="قياس أداء خط الترجمة على ملفات اصطناعية")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="معامل عدد الصفحات (1.0 = 100 صفحة لكل نوع و1000 للكتاب الطويل)")
+    parser.add_argument('--only', default=None, help="أسماء السيناريوهات مفصولة بفواصل: " + ','.join(CORPUS))
+    parser.add_argument('--corpus-dir', default=str(BASE_DIR / "cache" / "bench_corpus"))
+    parser.add_argument('--output', default=None, help="ملف النتائج JSON")
+    parser.add_argument('--latency', type=float, default=0.0, help="زمن وهمي لكل طلب ترجمة بالثواني")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="عدد العمليات لمعالجة الصفحات (مراحل العمليات العاملة لا تقاس)")
+    parser.add_argument('--no-pipeline', action='store_true', help="تعطيل خط المعالجة المتداخل")
+    parser.add_argument('--low-memory', action='store_true', help="وضع الذاكرة المحدودة")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    files = generate_corpus(Path(args.corpus_dir), args.scale, only)
+    options = {
+        'scale': args.scale,
+        'latency': args.latency,
+        'workers': args.workers,
+        'pipeline': not args.no_pipeline,
+        'low_memory': args.low_memory
+    }
+    results = run_benchmarks(files, options)
+
+    output_path = Path(args.output) if args.output else (
+        BASE_DIR / "cache" / "benchmarks" /
+        f"bench_{results['commit'] or 'local'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+
+    print_summary(results)
+    print(f"\nالنتائج: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chess Notation Tokenizer (SAN / PGN)
+Created: 2025-02-26 11:37:52
+Author: x9ci
+"""
+# chess_notation.py
+
+import re
+from typing import List, Optional, Tuple
+
+# نقلة بالتدوين الجبري المختصر: قطعة، بيدق (مع الترقية)، أو تبييت
+MOVE = (
+    r"(?:[KQRBN][a-h]?[1-8]?x?[a-h][1-8]"
+    r"|[a-h](?:x[a-h])?[1-8](?:=?[QRBN])?"
+    r"|O-O(?:-O)?|0-0(?:-0)?)"
+    r"[+#]?(?:[!?]{1,2})?"
+)
+MOVE_NUMBER = r"\d{1,4}\.{1,3}"
+RESULT = r"(?:1-0|0-1|½-½|1/2-1/2)"
+TOKEN = rf"(?:(?:{MOVE_NUMBER})\s*)?{MOVE}|{RESULT}"
+
+# سلسلة نقلات متتالية داخل نص عادي
+NOTATION_RUN = re.compile(
+    rf"(?<![\w./-])(?:{TOKEN})(?:[ \t,;]+(?:{TOKEN}))*(?![\w/-])"
+)
+# كتلة كاملة من النقلات وأرقامها فقط (قائمة نقلات أو نتيجة مباراة)
+# كل عنصر يبدأ بطريقة واحدة فقط حتى لا يتضاعف التراجع في الكتل غير المطابقة
+MOVE_LIST = re.compile(
+    rf"[\s,;.]*(?:(?:(?:{TOKEN})(?![\w/-])[\s,;.]*)+(?:{MOVE_NUMBER}[\s,;.]*)?"
+    rf"|{MOVE_NUMBER}[\s,;.]*)"
+)
+# جزء يستحق الترجمة: كلمة من حرفين على الأقل
+PROSE = re.compile(r"[^\W\d_]{2,}")
+# رمز مؤقت مكان سلسلة النقلات: أرقام بين قوسين لا يترجمها المحرك
+PLACEHOLDER = "⟦{}⟧"
+PLACEHOLDER_PATTERN = re.compile(r"⟦\s*(\d+)\s*⟧")
+
+
+def is_move_list(text: str) -> bool:
+    """الكتلة كلها نقلات شطرنج (تستبعد من الترجمة دون تقسيم)"""
+    return bool(text) and MOVE_LIST.fullmatch(text) is not None
+
+
+def is_prose(text: str) -> bool:
+    """الجزء يحتوي كلمات تحتاج إلى ترجمة"""
+    return PROSE.search(text) is not None
+
+
+def split_runs(text: str) -> List[Tuple[str, bool]]:
+    """تقسيم النص إلى أجزاء عادية وسلاسل نقلات بترتيبها (الجزء، هل هو نقلات)"""
+    parts = []
+    last = 0
+    for match in NOTATION_RUN.finditer(text):
+        if match.start() > last:
+            parts.append((text[last:match.start()], False))
+        parts.append((match.group(), True))
+        last = match.end()
+    if last < len(text):
+        parts.append((text[last:], False))
+    return parts
+
+
+def mask(text: str) -> Tuple[str, List[str]]:
+    """استبدال كل سلسلة نقلات برمز مؤقت حتى تترجم الجملة كاملة في طلب واحد"""
+    runs = []
+
+    def replace(match):
+        runs.append(match.group())
+        return PLACEHOLDER.format(len(runs) - 1)
+
+    return NOTATION_RUN.sub(replace, text), runs
+
+
+def has_prose(masked: str) -> bool:
+    """النص المخفي يحتوي كلمات تحتاج إلى ترجمة غير الرموز المؤقتة"""
+    return is_prose(PLACEHOLDER_PATTERN.sub(' ', masked))
+
+
+def unmask(translated: Optional[str], runs: List[str]) -> Optional[str]:
+    """إعادة النقلات مكان رموزها في النص المترجم
+
+    النقلة التي أسقط المحرك رمزها تلحق بنهاية النص حتى لا تضيع، وفشل
+    الترجمة (None) يبقى كما هو.
+    """
+    if translated is None:
+        return None
+    restored = set()
+
+    def replace(match):
+        index = int(match.group(1))
+        if index >= len(runs):
+            return ''
+        restored.add(index)
+        return runs[index]
+
+    text = PLACEHOLDER_PATTERN.sub(replace, translated)
+    missing = [run for index, run in enumerate(runs) if index not in restored]
+    return ' '.join([text] + missing) if missing else text
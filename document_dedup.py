@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Document-wide String Deduplication
+Created: 2025-02-14 08:56:03
+Author: x9ci
+"""
+# document_dedup.py
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List
+
+
+class DocumentDeduplicator:
+    """تجميع النصوص المتكررة في المستند (الترويسات والتذييلات والتعليقات) وترجمة كل نص فريد مرة واحدة"""
+
+    def __init__(self, page_processor, chunk_size: int = 2000):
+        self.logger = logging.getLogger(__name__)
+        self.page_processor = page_processor
+        self.text_processor = page_processor.text_processor
+        self.chunk_size = chunk_size
+        self.occurrences = Counter()
+
+    def collect(self, pages_content: Iterable[List[Dict]]):
+        """جمع النصوص القابلة للترجمة من جميع الصفحات"""
+        for page_content in pages_content:
+            for block in page_content or []:
+                text = self.page_processor.prepare_block_text(block)
+                if text:
+                    self.occurrences[text] += 1
+
+    def translate_unique(self) -> Dict[str, str]:
+        """ترجمة النصوص الفريدة وتخزينها لتوزيعها على جميع الكتل"""
+        unique_texts = list(self.occurrences)
+        translations = {}
+        for start in range(0, len(unique_texts), self.chunk_size):
+            chunk = unique_texts[start:start + self.chunk_size]
+            for text, translated in zip(chunk, self.text_processor.translate_texts(chunk)):
+                if translated:
+                    translations[text] = translated
+
+        self.text_processor.pretranslated.update(translations)
+        return translations
+
+    def stats(self) -> Dict:
+        """نسبة إزالة التكرار"""
+        total = sum(self.occurrences.values())
+        unique = len(self.occurrences)
+        return {
+            'total_strings': total,
+            'unique_strings': unique,
+            'dedup_ratio': (1 - unique / total) if total else 0.0
+        }
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-open PDF Document Session
+Created: 2025-02-17 12:40:09
+Author: x9ci
+"""
+# document_session.py
+
+import hashlib
+import io
+import logging
+import mmap
+from pathlib import Path
+
+import pdfplumber
+from PyPDF2 import PdfReader
+
+
+class MappedFileView(io.RawIOBase):
+    """قارئ مستقل الموضع فوق ملف معين في الذاكرة
+
+    كل محلل (pdfplumber و PyPDF2) يحصل على قارئ خاص به حتى لا تتداخل
+    عمليات التنقل بينهما عند العمل من خيوط مختلفة.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.buffer)
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, target):
+        data = self.buffer[self.position:self.position + len(target)]
+        size = len(data)
+        target[:size] = data
+        self.position += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.buffer.release()
+        super().close()
+
+
+class DocumentSession:
+    """فتح ملف PDF مرة واحدة ومشاركة تحليله بين الاستخراج والدمج
+
+    الملف يعين في الذاكرة مرة واحدة، ويحلل كل من pdfplumber و PyPDF2 مرة
+    واحدة عند أول طلب، وتحمل الصفحات عند الحاجة فقط. في وضع الذاكرة
+    المحدودة تفرغ ذاكرة كل صفحة بعد استخدامها.
+    """
+
+    def __init__(self, input_path, release_pages: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.input_path = Path(input_path)
+        self.release_pages = release_pages
+        self._file = None
+        self._mapped = None
+        self._views = []
+        self._reader = None
+        self._reader_view = None
+        self._plumber = None
+        self._plumber_pages = None
+        self._fingerprint = None
+
+    def open(self):
+        """تعيين الملف في الذاكرة والتحقق من صلاحيته"""
+        self._file = open(self.input_path, 'rb')
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # الملفات الفارغة لا يمكن تعيينها
+            self.close()
+            raise ValueError(f"ملف PDF فارغ: {self.input_path}")
+        # تحليل جدول الإحالات يكفي للتحقق من صلاحية الملف
+        _ = self.reader
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _view(self):
+        view = MappedFileView(self._mapped)
+        self._views.append(view)
+        return view
+
+    @property
+    def reader(self) -> PdfReader:
+        """قارئ PyPDF2 المشترك (لدمج الطبقات)"""
+        if self._reader is None:
+            self._reader_view = self._view()
+            self._reader = PdfReader(self._reader_view)
+        return self._reader
+
+    @property
+    def plumber(self):
+        """مستند pdfplumber المشترك (لاستخراج النصوص)"""
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self._view())
+            if self.release_pages:
+                # لا تحتفظ pdfminer بالكائنات المحللة (ومنها بيانات الصور) بعد انتهاء صفحتها
+                self._plumber.doc.caching = False
+        return self._plumber
+
+    @property
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    @property
+    def fingerprint(self) -> str:
+        """بصمة المحتوى محسوبة من الذاكرة المعينة دون قراءة الملف مجدداً"""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1(self._mapped).hexdigest()
+        return self._fingerprint
+
+    def plumber_page(self, page_num: int):
+        """صفحة pdfplumber (تحلل محتوياتها عند أول استخدام)"""
+        if self._plumber_pages is None:
+            self._plumber_pages = self.plumber.pages
+        return self._plumber_pages[page_num]
+
+    def reader_page(self, page_num: int):
+        """صفحة PyPDF2 لدمج طبقة الترجمة"""
+        return self.reader.pages[page_num]
+
+    def release_page(self, page_num: int):
+        """تفريغ الحروف والكائنات المخزنة لصفحة pdfplumber بعد استخراجها"""
+        if not self.release_pages or self._plumber_pages is None:
+            return
+        try:
+            self._plumber_pages[page_num].close()
+        except Exception as e:
+            self.logger.debug(f"خطأ في تفريغ الصفحة {page_num + 1}: {str(e)}")
+
+    def reset_reader(self):
+        """تحرير صفحات PyPDF2 المحللة والمدمجة (يعاد تحليل الجدول عند الطلب التالي)"""
+        if self._reader_view is not None:
+            self._views.remove(self._reader_view)
+            self._reader_view.close()
+        self._reader = None
+        self._reader_view = None
+
+    def close(self):
+        """إغلاق المحللين وتحرير الذاكرة المعينة"""
+        try:
+            if self._plumber is not None:
+                self._plumber.close()
+            for view in self._views:
+                view.close()
+            if self._mapped is not None:
+                self._mapped.close()
+            if self._file is not None:
+                self._file.close()
+        except Exception as e:
+            self.logger.warning(f"خطأ في إغلاق المستند: {str(e)}")
+        finally:
+            self._plumber = None
+            self._plumber_pages = None
+            self._reader = None
+            self._reader_view = None
+            self._views = []
+            self._mapped = None
+            self._file = None
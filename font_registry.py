@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Process-wide Arabic Font Registry
+Created: 2025-02-23 10:19:57
+Author: x9ci
+"""
+# font_registry.py
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+BASE_DIR = Path(__file__).parent
+FONT_URL = "https://github.com/google/fonts/raw/main/ofl/amiri/Amiri-Regular.ttf"
+
+
+def candidate_font_paths(fonts_dir: Path) -> List[str]:
+    """مسارات الخطوط المحتملة بترتيب الأفضلية"""
+    paths = [
+        "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
+        "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
+        "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
+        "/usr/share/fonts/truetype/fonts-arabeyes/ae_Petra.ttf",
+        "/usr/share/fonts/truetype/fonts-arabeyes/ae_Salem.ttf",
+        "/usr/share/fonts/truetype/arabic/Amiri-Regular.ttf",
+        str(fonts_dir / "Amiri-Regular.ttf"),
+        str(fonts_dir / "ae_AlArabiya.ttf"),
+        os.path.expanduser("~/.fonts/Amiri-Regular.ttf"),
+        os.path.expanduser("~/.local/share/fonts/Amiri-Regular.ttf"),
+        "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+        str(fonts_dir / "FreeSans.ttf"),
+    ]
+    return [p for p in paths if p]
+
+
+class FontRegistry:
+    """تحديد الخط العربي مرة واحدة وحفظ نتيجة البحث في ملف صغير
+
+    العمليات العاملة والتشغيلات اللاحقة تقرأ المسار من الملف مباشرة دون
+    فحص جميع المسارات المحتملة. المسار الصريح أو PDF_ARABIC_FONT يتقدم دائماً
+    على الملف المحفوظ، والملف المحفوظ يخص نتيجة البحث فقط.
+
+    الملف يحفظ المسار وحده: جداول الخط المحللة لا تحفظ لأن reportlab يحتاجها
+    كاملة لتضمين الحروف المستخدمة ولا يمكن تسلسلها، فالعملية العاملة المنشأة
+    بـ spawn تحلل الخط مرة واحدة عند تهيئتها. فشل التسجيل يحفظ أيضاً لبقية
+    العملية حتى لا يتكرر البحث والتنزيل مع كل كائن ينشأ لكل صفحة.
+    """
+
+    def __init__(self, cache_path=None, fonts_dir=None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_path = Path(cache_path or BASE_DIR / "cache" / "font_registry.json")
+        self.fonts_dir = Path(fonts_dir or BASE_DIR / "fonts")
+        self.lock = threading.Lock()
+        self.registered: Dict[str, str] = {}
+        self.failed: Set[Tuple[str, Optional[str]]] = set()  # (اسم الخط، المسار الصريح) التي فشل تسجيلها
+
+    @staticmethod
+    def font_key(font_path: str) -> Optional[str]:
+        """مفتاح الخط: المسار مع وقت التعديل (يتغير عند استبدال الملف)"""
+        try:
+            return f"{os.path.abspath(font_path)}:{os.stat(font_path).st_mtime_ns}"
+        except OSError:
+            return None
+
+    def load_cached(self) -> Optional[str]:
+        """مسار الخط المحفوظ إذا كان الملف نفسه لم يتغير"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry['key'] == self.font_key(entry['path']):
+                return entry['path']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def save_cached(self, font_path: str):
+        """حفظ مسار الخط الذي وجده البحث مع مفتاحه"""
+        try:
+            entry = {'path': font_path, 'key': self.font_key(font_path)}
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            self.logger.warning(f"تعذر حفظ بيانات الخط: {str(e)}")
+
+    def discover(self) -> Optional[str]:
+        """البحث عن أول خط متوفر، وتنزيل خط أميري إذا لم يوجد أي خط"""
+        for font_path in candidate_font_paths(self.fonts_dir):
+            if os.path.exists(font_path):
+                return font_path
+        return self.download_font()
+
+    def download_font(self) -> Optional[str]:
+        """تنزيل خط أميري إلى مجلد الخطوط المحلي"""
+        try:
+            import requests
+            self.logger.warning("لم يتم العثور على أي خط عربي. جاري محاولة تنزيل خط Amiri...")
+            response = requests.get(FONT_URL, timeout=30)
+            response.raise_for_status()
+            self.fonts_dir.mkdir(parents=True, exist_ok=True)
+            font_path = self.fonts_dir / "Amiri-Regular.ttf"
+            with open(font_path, 'wb') as f:
+                f.write(response.content)
+            return str(font_path)
+        except Exception as e:
+            self.logger.error(f"خطأ في تنزيل الخط: {str(e)}")
+            return None
+
+    def register(self, font_name: str = 'Arabic', font_path: Optional[str] = None) -> bool:
+        """تسجيل الخط العربي في reportlab مرة واحدة لكل عملية
+
+        ترتيب الاختيار: المسار الصريح، ثم PDF_ARABIC_FONT، ثم نتيجة البحث
+        المحفوظة، ثم البحث في المسارات المحتملة.
+        """
+        if font_name in self.registered:
+            return True
+        if (font_name, font_path) in self.failed:
+            return False
+        with self.lock:
+            if font_name in self.registered:
+                return True
+            if (font_name, font_path) in self.failed:
+                return False
+            if font_name in pdfmetrics.getRegisteredFontNames():
+                # مسجل مسبقاً (مثلاً موروث من العملية الأم)
+                self.registered[font_name] = getattr(pdfmetrics.getFont(font_name).face, 'filename', '')
+                return True
+
+            requested_path = font_path
+            font_path = font_path or os.getenv('PDF_ARABIC_FONT')
+            if font_path and not os.path.exists(font_path):
+                self.logger.warning(f"الخط المحدد غير موجود: {font_path}")
+                font_path = None
+            discovered = False
+            if not font_path:
+                font_path = self.load_cached()
+            if not font_path:
+                font_path = self.discover()
+                discovered = True
+            if not font_path:
+                self.logger.error("لم يتم العثور على خط عربي")
+                self.failed.add((font_name, requested_path))
+                return False
+            try:
+                font = TTFont(font_name, font_path)
+                pdfmetrics.registerFont(font)
+            except Exception as e:
+                self.logger.error(f"فشل تحميل الخط {font_path}: {str(e)}")
+                self.failed.add((font_name, requested_path))
+                return False
+
+            if discovered:
+                self.save_cached(font_path)
+            self.registered[font_name] = font_path
+            self.logger.info(f"تم تحميل الخط: {font_path}")
+            return True
+
+
+_registry = FontRegistry()
+
+
+def configure_font_registry(cache_path=None, fonts_dir=None):
+    """تحديد ملف حفظ الخط ومجلد الخطوط (قبل أول تسجيل)"""
+    global _registry
+    if not _registry.registered:
+        _registry = FontRegistry(cache_path, fonts_dir)
+
+
+def ensure_arabic_font(font_name: str = 'Arabic', font_path: Optional[str] = None) -> bool:
+    """التأكد من تسجيل الخط العربي في العملية الحالية"""
+    return _registry.register(font_name, font_path)
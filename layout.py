@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Page Layout Analysis
+Created: 2025-02-16 10:12:44
+Author: x9ci
+"""
+# layout.py
+
+import logging
+from collections import Counter
+from typing import Dict, List
+
+
+class LayoutAnalyzer:
+    """إعادة بناء الأسطر والفقرات من كلمات pdfplumber بإحداثياتها الحقيقية
+
+    الكلمات المتقاربة عمودياً تشكل سطراً، والفجوة الأفقية الكبيرة داخل السطر
+    تفصل بين الأعمدة، ثم تضم الأسطر المتتالية في نفس العمود وبنفس حجم الخط
+    إلى فقرة واحدة تترجم كوحدة.
+    """
+
+    def __init__(self, line_tolerance: float = 0.5, column_gap: float = 2.5,
+                 paragraph_gap: float = 0.8, size_tolerance: float = 0.2,
+                 max_paragraph_chars: int = 1200):
+        self.logger = logging.getLogger(__name__)
+        # جميع القيم نسبية إلى حجم الخط
+        self.line_tolerance = line_tolerance
+        self.column_gap = column_gap
+        self.paragraph_gap = paragraph_gap
+        self.size_tolerance = size_tolerance
+        self.max_paragraph_chars = max_paragraph_chars
+
+    def analyze(self, page) -> List[Dict]:
+        """استخراج فقرات الصفحة ككتل نصية"""
+        words = page.extract_words(
+            x_tolerance=3,
+            y_tolerance=3,
+            keep_blank_chars=False,
+            extra_attrs=['fontname', 'size']
+        )
+        lines = self.group_lines(words)
+        return self.group_paragraphs(lines)
+
+    @staticmethod
+    def word_size(word: Dict) -> float:
+        size = word.get('size')
+        if size:
+            return float(size)
+        return max(1.0, float(word['bottom']) - float(word['top']))
+
+    def group_lines(self, words: List[Dict]) -> List[Dict]:
+        """تجميع الكلمات في أسطر وتقسيم كل سطر عند فجوات الأعمدة"""
+        words = [w for w in words if w.get('text', '').strip()]
+        words.sort(key=lambda w: (float(w['top']), float(w['x0'])))
+
+        rows = []
+        for word in words:
+            size = self.word_size(word)
+            middle = (float(word['top']) + float(word['bottom'])) / 2
+            row = rows[-1] if rows else None
+            if row and abs(middle - row['middle']) <= self.line_tolerance * max(size, row['size']):
+                row['words'].append(word)
+            else:
+                rows.append({'middle': middle, 'size': size, 'words': [word]})
+
+        lines = []
+        for row in rows:
+            row_words = sorted(row['words'], key=lambda w: float(w['x0']))
+            segment = [row_words[0]]
+            for word in row_words[1:]:
+                gap = float(word['x0']) - float(segment[-1]['x1'])
+                if gap > self.column_gap * max(self.word_size(word), self.word_size(segment[-1])):
+                    lines.append(self.make_block(segment, ' '))
+                    segment = []
+                segment.append(word)
+            lines.append(self.make_block(segment, ' '))
+        return lines
+
+    def group_paragraphs(self, lines: List[Dict]) -> List[Dict]:
+        """ضم الأسطر المتتالية في نفس العمود إلى فقرات"""
+        paragraphs = []
+        open_paragraphs = []
+        for line in sorted(lines, key=lambda l: (l['top'], l['x0'])):
+            target = None
+            still_open = []
+            for paragraph in open_paragraphs:
+                last = paragraph[-1]
+                gap = line['top'] - last['bottom']
+                # الفقرات التي ابتعد عنها السطر الحالي لا يمكن أن تمتد بعد الآن
+                if gap > self.paragraph_gap * last['size'] * 2:
+                    continue
+                still_open.append(paragraph)
+                if target is None and self.continues_paragraph(paragraph, line, gap):
+                    target = paragraph
+            open_paragraphs = still_open
+
+            if target is not None:
+                target.append(line)
+            else:
+                paragraph = [line]
+                paragraphs.append(paragraph)
+                open_paragraphs.append(paragraph)
+
+        blocks = [self.make_paragraph(paragraph) for paragraph in paragraphs]
+        blocks.sort(key=lambda b: (b['top'], b['x0']))
+        return blocks
+
+    def continues_paragraph(self, paragraph: List[Dict], line: Dict, gap: float) -> bool:
+        last = paragraph[-1]
+        if gap < -self.line_tolerance * last['size'] or gap > self.paragraph_gap * last['size']:
+            return False
+        if abs(line['size'] - last['size']) > self.size_tolerance * last['size']:
+            return False
+        # يجب أن يتداخل السطر أفقياً مع الفقرة (نفس العمود)
+        left = min(l['x0'] for l in paragraph)
+        right = max(l['x1'] for l in paragraph)
+        if line['x1'] <= left or line['x0'] >= right:
+            return False
+        length = sum(len(l['text']) + 1 for l in paragraph)
+        return length + len(line['text']) <= self.max_paragraph_chars
+
+    @staticmethod
+    def make_block(items: List[Dict], separator: str) -> Dict:
+        """كتلة بحدود تشمل جميع العناصر وحجم الخط وخط النص الغالبين"""
+        x0 = min(float(i['x0']) for i in items)
+        top = min(float(i['top']) for i in items)
+        x1 = max(float(i['x1']) for i in items)
+        bottom = max(float(i['bottom']) for i in items)
+        sizes = sorted(LayoutAnalyzer.word_size(i) for i in items)
+        fonts = Counter(i.get('fontname') for i in items if i.get('fontname'))
+        return {
+            'text': separator.join(i['text'].strip() for i in items),
+            'bbox': (x0, top, x1, bottom),
+            'x0': x0,
+            'top': top,
+            'x1': x1,
+            'bottom': bottom,
+            'size': sizes[len(sizes) // 2],
+            'fontname': fonts.most_common(1)[0][0] if fonts else None
+        }
+
+    def make_paragraph(self, lines: List[Dict]) -> Dict:
+        block = self.make_block(lines, ' ')
+        # وصل الكلمات المقسومة بشرطة في نهاية السطر
+        text = lines[0]['text']
+        for line in lines[1:]:
+            if text.endswith('-') and line['text'][:1].islower():
+                text = text[:-1] + line['text']
+            else:
+                text = f"{text} {line['text']}"
+        block['text'] = text
+        block['lines'] = len(lines)
+        return block
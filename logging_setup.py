@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Queued Logging With Verbosity Levels
+Created: 2025-02-25 16:21:09
+Author: x9ci
+"""
+# logging_setup.py
+
+import atexit
+import itertools
+import logging
+import multiprocessing
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# مستويات التفصيل: -1 تحذيرات فقط، 0 معلومات، 1 تفاصيل بالعينة، 2 كل التفاصيل
+VERBOSITY_LEVELS = {-1: logging.WARNING, 0: logging.INFO, 1: logging.DEBUG, 2: logging.DEBUG}
+
+# مكتبات تسجل تفاصيل التحليل الداخلي لكل كائن، فلا تنزل عن مستوى المعلومات
+NOISY_LOGGERS = ('pdfminer', 'PIL', 'urllib3', 'httpx', 'httpcore', 'fontTools')
+
+_listener: Optional[QueueListener] = None
+# طابور السجلات القادمة من العمليات العاملة ومستمعه في العملية الأم
+_process_queue = None
+_process_listener: Optional[QueueListener] = None
+# إعدادات التفصيل الحالية لتطبيقها في العمليات العاملة
+_settings = (0, 100)
+
+
+class SampledDebugFilter(logging.Filter):
+    """تمرير سجل واحد من كل N سجلات تفصيلية، مع تمرير باقي المستويات كاملة"""
+
+    def __init__(self, every: int = 100):
+        super().__init__()
+        self.every = max(1, every)
+        self.counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        return next(self.counter) % self.every == 0
+
+
+def setup_logging(log_dir=None, verbosity: int = 0, use_queue: bool = True,
+                  debug_sample: int = 100) -> Optional[QueueListener]:
+    """إعداد التسجيل للعملية الحالية
+
+    في وضع الطابور تضع الخيوط العاملة السجلات في طابور فقط، ويتولى خيط
+    مستقل الكتابة إلى الطرفية والملف حتى لا تنتظر حلقات المعالجة عمليات الإدخال
+    والإخراج.
+    """
+    global _listener, _settings
+    stop_logging()
+
+    verbosity = max(-1, min(2, verbosity))
+    _settings = (verbosity, debug_sample)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if log_dir is not None:
+        log_dir = Path(log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        log_file = log_dir / f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        handlers.append(logging.FileHandler(str(log_file), encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = _reset_root(verbosity)
+
+    if use_queue:
+        front = QueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(front.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        front_handlers = [front]
+    else:
+        front_handlers = handlers
+
+    for handler in front_handlers:
+        if verbosity == 1:
+            # الفلتر قبل الطابور حتى لا تنقل السجلات المستبعدة أصلاً
+            handler.addFilter(SampledDebugFilter(debug_sample))
+        root.addHandler(handler)
+    return _listener
+
+
+def _reset_root(verbosity: int) -> logging.Logger:
+    """إزالة معالجات الجذر وضبط مستوى التفصيل"""
+    level = VERBOSITY_LEVELS[verbosity]
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.INFO))
+    return root
+
+
+def worker_logging_args() -> tuple:
+    """معاملات setup_worker_logging لمجمعات العمليات (تمرر في initargs)
+
+    في وضع الطابور تنشأ عند أول طلب طابور بين العمليات يقرؤه مستمع في هذه
+    العملية ويكتب سجلاته بالمعالجات نفسها (الطرفية والملف).
+    """
+    global _process_queue, _process_listener
+    if _listener is not None and _process_queue is None:
+        _process_queue = multiprocessing.Queue()
+        _process_listener = QueueListener(_process_queue, *_listener.handlers, respect_handler_level=True)
+        _process_listener.start()
+    return (_process_queue,) + _settings
+
+
+def setup_worker_logging(log_queue=None, verbosity: int = 0, debug_sample: int = 100):
+    """إعداد التسجيل في عملية عاملة
+
+    معالج الطابور الموروث من العملية الأم يكتب في طابور لا يقرؤه أحد هنا، لذا
+    تستبدل به معالجة ترسل السجلات إلى العملية الأم، أو إلى الطرفية مباشرة
+    عند عدم استخدام الطابور.
+    """
+    verbosity = max(-1, min(2, verbosity))
+    root = _reset_root(verbosity)
+    if log_queue is not None:
+        handler = QueueHandler(log_queue)
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if verbosity == 1:
+        handler.addFilter(SampledDebugFilter(debug_sample))
+    root.addHandler(handler)
+
+
+def stop_logging():
+    """تفريغ الطوابير وإيقاف خيوط الكتابة"""
+    global _listener, _process_queue, _process_listener
+    if _process_listener is not None:
+        _process_listener.stop()
+        _process_listener = None
+    if _process_queue is not None:
+        _process_queue.close()
+        _process_queue = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bounded Memory Output
+Created: 2025-02-18 15:22:37
+Author: x9ci
+"""
+# low_memory.py
+
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject,
+    StreamObject
+)
+
+try:
+    import resource
+except ImportError:  # غير متوفر على ويندوز
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """أقصى استهلاك للذاكرة الفعلية في العملية الحالية (ميغابايت)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # القيمة بالكيلوبايت على لينكس وبالبايت على ماك
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """الاستهلاك الحالي للذاكرة الفعلية (لينكس فقط)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class _SegmentCopier:
+    """نسخ كائنات ملف PDF واحد إلى ملف الإخراج بأرقام جديدة فور الوصول إليها"""
+
+    def __init__(self, reader: PdfReader, out, offsets: Dict[int, int], next_id: int, parent: IndirectObject):
+        self.reader = reader
+        self.out = out
+        self.offsets = offsets
+        self.next_id = next_id
+        self.parent = parent
+        self.mapping: Dict[tuple, int] = {}  # (رقم الكائن، الجيل) في المقطع ← الرقم الجديد
+        self.pending: List[IndirectObject] = []
+        self.page_keys = set()
+
+    def allocate(self, key) -> int:
+        if key not in self.mapping:
+            self.mapping[key] = self.next_id
+            self.next_id += 1
+        return self.mapping[key]
+
+    def remap(self, obj):
+        """نسخة من الكائن تشير إلى الأرقام الجديدة (الكائنات غير المنسوخة تضاف للانتظار)"""
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in self.mapping:
+                self.allocate(key)
+                self.pending.append(obj)
+            return IndirectObject(self.mapping[key], 0, None)
+        if isinstance(obj, StreamObject):
+            # البيانات تنسخ كما هي مخزنة (مع مرشحاتها) دون فك ترميزها
+            copy = DecodedStreamObject()
+            copy._data = obj._data
+            for name, value in obj.items():
+                if name != '/Length':
+                    copy[NameObject(name)] = self.remap(value)
+            return copy
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for name, value in obj.items():
+                copy[NameObject(name)] = self.remap(value)
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.remap(value) for value in obj)
+        return obj
+
+    def write_object(self, object_id: int, obj):
+        self.offsets[object_id] = self.out.tell()
+        self.out.write(f"{object_id} 0 obj\n".encode('ascii'))
+        (NullObject() if obj is None else obj).write_to_stream(self.out, None)
+        self.out.write(b"\nendobj\n")
+
+    def copy_pages(self) -> List[IndirectObject]:
+        """كتابة صفحات المقطع وكل ما تشير إليه، وإرجاع مراجع الصفحات الجديدة"""
+        pages = self.reader.pages
+        page_ids = []
+        for index, page in enumerate(pages):
+            ref = page.indirect_ref
+            key = (ref.idnum, ref.generation) if ref is not None else ('page', index)
+            self.page_keys.add(key)
+            page_ids.append(self.allocate(key))
+
+        kids = []
+        for page, page_id in zip(pages, page_ids):
+            copy = DictionaryObject()
+            for name, value in page.items():
+                if name != '/Parent':
+                    copy[NameObject(name)] = self.remap(value)
+            copy[NameObject('/Parent')] = self.parent
+            self.write_object(page_id, copy)
+            while self.pending:
+                ref = self.pending.pop()
+                key = (ref.idnum, ref.generation)
+                if key not in self.page_keys:
+                    self.write_object(self.mapping[key], self.remap(ref.get_object()))
+            # الكائنات المكتوبة لا يعاد طلبها: تحرير نسخها المحللة قبل الصفحة التالية
+            resolved = getattr(self.reader, 'resolved_objects', None)
+            if resolved is not None:
+                resolved.clear()
+            kids.append(IndirectObject(page_id, 0, None))
+        return kids
+
+
+def concatenate_pdfs(input_paths: List[Path], output_path) -> int:
+    """ضم ملفات PDF بالترتيب بكتابة كائنات كل ملف إلى القرص مباشرة
+
+    لا يحلل إلا ملف مدخل واحد في كل مرة ولا تبقى كائناته بعد كتابتها، ثم
+    تكتب شجرة الصفحات وجدول الإحالات في النهاية. تعيد عدد الصفحات.
+    """
+    offsets: Dict[int, int] = {}
+    kids: List[IndirectObject] = []
+    next_id = 3  # 1 للفهرس و2 لشجرة الصفحات
+    pages_ref = IndirectObject(2, 0, None)
+    with open(output_path, 'wb') as out:
+        out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        for path in input_paths:
+            with open(path, 'rb') as segment:
+                copier = _SegmentCopier(PdfReader(segment), out, offsets, next_id, pages_ref)
+                kids.extend(copier.copy_pages())
+                next_id = copier.next_id
+
+        copier = _SegmentCopier(None, out, offsets, next_id, pages_ref)
+        copier.write_object(2, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(kids),
+            NameObject('/Count'): NumberObject(len(kids))
+        }))
+        copier.write_object(1, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): pages_ref
+        }))
+
+        xref_offset = out.tell()
+        out.write(f"xref\n0 {next_id}\n0000000000 65535 f \n".encode('ascii'))
+        for object_id in range(1, next_id):
+            out.write(f"{offsets[object_id]:010d} 00000 n \n".encode('ascii'))
+        out.write(f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+    return len(kids)
+
+
+class SegmentedPdfWriter:
+    """كاتب PDF يفرغ الصفحات المكتملة إلى مقاطع على القرص كل عدد محدد من الصفحات
+
+    بعد كل مقطع يمكن تحرير الصفحات المدمجة من الذاكرة، ثم تضم المقاطع في
+    الملف النهائي بالكتابة المتتابعة دون تحميلها كلها في الذاكرة.
+    """
+
+    def __init__(self, segment_dir, segment_pages: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.segment_dir = Path(segment_dir)
+        self.segment_pages = max(1, segment_pages)
+        self.segments: List[Path] = []
+        self.writer = PdfWriter()
+        self.pending_pages = 0
+
+    def add_page(self, page_obj):
+        """إضافة صفحة وتفريغ المقطع عند اكتماله"""
+        self.writer.add_page(page_obj)
+        self.pending_pages += 1
+        if self.pending_pages >= self.segment_pages:
+            self.spill()
+
+    def spill(self):
+        """كتابة الصفحات الحالية في مقطع جديد وبدء كاتب فارغ"""
+        if not self.pending_pages:
+            return
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        segment_path = self.segment_dir / f"segment_{len(self.segments):05d}.pdf"
+        with open(segment_path, 'wb') as f:
+            self.writer.write(f)
+        self.segments.append(segment_path)
+        self.writer = PdfWriter()
+        self.pending_pages = 0
+        self.logger.debug(f"تم تفريغ المقطع {len(self.segments)} (الذاكرة القصوى: {peak_rss_mb()} MB)")
+
+    def write(self, output_path):
+        """تجميع المقاطع في الملف النهائي"""
+        self.spill()
+        output_path = Path(output_path)
+        if len(self.segments) == 1:
+            shutil.move(str(self.segments[0]), str(output_path))
+            return
+
+        concatenate_pdfs(self.segments, output_path)
+
+    def stats(self) -> Dict:
+        return {
+            'segments': len(self.segments),
+            'segment_pages': self.segment_pages,
+            'peak_rss_mb': peak_rss_mb()
+        }
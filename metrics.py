@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Processing Metrics Registry
+Created: 2025-02-25 10:03:27
+Author: x9ci
+"""
+# metrics.py
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Tuple
+
+# حدود المدرجات التكرارية بالثواني
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DOCUMENT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+class Counter:
+    """عداد متزايد"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def drain(self):
+        """القيمة المتراكمة منذ آخر تفريغ مع تصفيرها"""
+        with self.lock:
+            value, self.value = self.value, 0.0
+            return value
+
+    def merge(self, value):
+        self.inc(value)
+
+    def samples(self):
+        yield self.name, '', self.value
+
+
+class Gauge(Counter):
+    """قيمة لحظية"""
+
+    kind = 'gauge'
+
+    def set(self, value: float):
+        with self.lock:
+            self.value = value
+
+    def drain(self):
+        # القيمة اللحظية تخص العملية التي قاستها فلا تنقل
+        return None
+
+    def merge(self, value):
+        pass
+
+
+class Histogram:
+    """مدرج تكراري للأزمنة بحدود ثابتة (تراكمية عند التصدير كما في Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        """قياس زمن كتلة من الشيفرة"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets[repr(bound)] = cumulative
+            buckets['+Inf'] = self.count
+            return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+    def drain(self):
+        """الملاحظات المتراكمة منذ آخر تفريغ مع تصفيرها"""
+        with self.lock:
+            if not self.count:
+                return None
+            data = {'buckets': self.buckets, 'counts': self.counts, 'count': self.count, 'sum': self.sum}
+            self.counts = [0] * len(self.buckets)
+            self.count = 0
+            self.sum = 0.0
+            return data
+
+    def merge(self, data: Dict):
+        if tuple(data['buckets']) != self.buckets:
+            raise ValueError(f"حدود مختلفة للمدرج {self.name}")
+        with self.lock:
+            self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+            self.count += data['count']
+            self.sum += data['sum']
+
+    def samples(self):
+        data = self.snapshot()
+        for bound, count in data['buckets'].items():
+            yield f"{self.name}_bucket", f'{{le="{bound}"}}', count
+        yield f"{self.name}_sum", '', data['sum']
+        yield f"{self.name}_count", '', data['count']
+
+
+class MetricsRegistry:
+    """سجل المقاييس للعملية الحالية مع تصدير بصيغة Prometheus أو JSON"""
+
+    def __init__(self, namespace: str = 'pdf_translator'):
+        self.namespace = namespace
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        return self._get_full(cls, f"{self.namespace}_{name}", help_text, **kwargs)
+
+    def _get_full(self, cls, full_name: str, help_text: str, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(full_name)
+            if metric is None:
+                metric = self.metrics[full_name] = cls(full_name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = '') -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {
+            'timestamp': time.time(),
+            'metrics': {m.name: {'type': m.kind, 'value': m.snapshot()} for m in metrics}
+        }
+
+    def drain(self) -> Dict:
+        """تفريغ العدادات والمدرجات لنقلها من عملية عاملة إلى العملية الأم"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        data = {}
+        for metric in metrics:
+            value = metric.drain()
+            if value:
+                data[metric.name] = (metric.kind, metric.help, value)
+        return data
+
+    def merge(self, data: Dict):
+        """إضافة مقاييس مفرغة من عملية عاملة إلى هذا السجل"""
+        classes = {'counter': Counter, 'histogram': Histogram}
+        for name, (kind, help_text, value) in data.items():
+            kwargs = {'buckets': value['buckets']} if kind == 'histogram' else {}
+            try:
+                self._get_full(classes[kind], name, help_text, **kwargs).merge(value)
+            except (KeyError, ValueError) as e:
+                logging.getLogger(__name__).warning(f"تعذر دمج المقياس {name}: {str(e)}")
+
+    def to_prometheus(self) -> str:
+        """نص بصيغة Prometheus للمجمع textfile في node-exporter"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """كتابة المقاييس ذرياً (JSON إذا انتهى المسار بـ .json وإلا صيغة Prometheus)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == '.json':
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        # الكتابة في ملف مؤقت ثم إعادة التسمية حتى لا يقرأ المجمع ملفاً ناقصاً
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsExporter:
+    """كتابة المقاييس دورياً إلى ملف أثناء المهام الطويلة"""
+
+    def __init__(self, registry: MetricsRegistry, path, interval: float = 15.0):
+        self.logger = logging.getLogger(__name__)
+        self.registry = registry
+        self.path = Path(path)
+        self.interval = max(1.0, interval)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self):
+        try:
+            self.registry.write(self.path)
+        except Exception as e:
+            self.logger.warning(f"تعذر كتابة ملف المقاييس: {str(e)}")
+
+    def stop(self):
+        """إيقاف التصدير الدوري وكتابة القيم النهائية"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.export()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR for Scanned Pages
+Created: 2025-02-19 11:08:52
+Author: x9ci
+"""
+# ocr_pages.py
+
+from typing import Dict, List
+
+
+class OCRError(Exception):
+    """تعذرت قراءة صفحة ممسوحة ضوئياً (المحرك غير مثبت أو فشل التعرف)"""
+    pass
+
+
+def tesseract_available() -> bool:
+    """التحقق من وجود برنامج Tesseract"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def is_image_only_page(page) -> bool:
+    """صفحة ممسوحة ضوئياً: لا تحتوي على حروف نصية لكنها تحتوي على صور"""
+    return not page.chars and bool(page.images)
+
+
+def blocks_from_ocr_data(data: Dict, dpi: int, min_confidence: float = 40) -> List[Dict]:
+    """تحويل ناتج image_to_data إلى كتل فقرات بإحداثيات الصفحة (نقاط من الأعلى)"""
+    scale = 72.0 / dpi
+    paragraphs = {}
+    for i, text in enumerate(data.get('text', [])):
+        text = (text or '').strip()
+        try:
+            confidence = float(data['conf'][i])
+        except (TypeError, ValueError):
+            confidence = -1
+        if not text or confidence < min_confidence:
+            continue
+
+        key = (data['block_num'][i], data['par_num'][i])
+        line_key = data['line_num'][i]
+        x0 = data['left'][i] * scale
+        top = data['top'][i] * scale
+        x1 = x0 + data['width'][i] * scale
+        bottom = top + data['height'][i] * scale
+
+        paragraph = paragraphs.setdefault(key, {'lines': {}, 'bbox': [x0, top, x1, bottom]})
+        paragraph['lines'].setdefault(line_key, []).append((text, bottom - top))
+        bbox = paragraph['bbox']
+        bbox[0], bbox[1] = min(bbox[0], x0), min(bbox[1], top)
+        bbox[2], bbox[3] = max(bbox[2], x1), max(bbox[3], bottom)
+
+    blocks = []
+    for key in sorted(paragraphs):
+        paragraph = paragraphs[key]
+        lines = [paragraph['lines'][n] for n in sorted(paragraph['lines'])]
+        heights = sorted(height for line in lines for _, height in line)
+        x0, top, x1, bottom = paragraph['bbox']
+        blocks.append({
+            'text': ' '.join(word for line in lines for word, _ in line),
+            'bbox': (x0, top, x1, bottom),
+            'x0': x0,
+            'top': top,
+            'x1': x1,
+            'bottom': bottom,
+            'size': heights[len(heights) // 2],
+            'fontname': None,
+            'lines': len(lines),
+            'source': 'ocr'
+        })
+    return blocks
+
+
+def ocr_page(input_path: str, page_num: int, dpi: int = 300, lang: str = 'eng',
+             min_confidence: float = 40) -> List[Dict]:
+    """تحويل صفحة واحدة إلى صورة وقراءة كلماتها بمواقعها (ترفع OCRError عند الفشل)"""
+    try:
+        import pytesseract
+        from pdf2image import convert_from_path
+        images = convert_from_path(input_path, dpi=dpi, first_page=page_num + 1, last_page=page_num + 1)
+        if not images:
+            raise OCRError(f"تعذر تحويل الصفحة {page_num + 1} إلى صورة")
+        data = pytesseract.image_to_data(images[0], lang=lang, output_type=pytesseract.Output.DICT)
+        return blocks_from_ocr_data(data, dpi, min_confidence)
+    except OCRError:
+        raise
+    except Exception as e:
+        raise OCRError(f"خطأ في التعرف الضوئي على الصفحة {page_num + 1}: {str(e)}") from e
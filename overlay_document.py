@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single Overlay Document for All Translated Pages
+Created: 2025-02-26 17:08:41
+Author: x9ci
+"""
+# overlay_document.py
+
+import logging
+import threading
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+
+
+class OverlayDocument:
+    """رسم طبقات الترجمة لكل صفحات الملف في مستند واحد متعدد الصفحات
+
+    الخطوط والموارد تكتب مرة واحدة عند حفظ المستند، ويحلل المستند مرة واحدة
+    ثم تدمج كل صفحة أصلية مع صفحتها فيه. ترتيب الصفحات داخل المستند لا يهم
+    لأن كل صفحة مسجلة برقم صفحتها الأصلية.
+
+    يمكن إنهاء المستند على دفعات (مقطع في وضع الذاكرة المحدودة) فتبدأ لوحة
+    جديدة بعد كل دفعة، ويمكن إلحاق مستندات رسمتها عمليات أخرى (نطاق صفحات
+    كل عامل)، فيضمن الخط مرة واحدة لكل دفعة أو نطاق بدلاً من كل صفحة.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.parts: Dict[int, Tuple[PdfReader, int]] = {}  # رقم الصفحة الأصلية ← (المستند المحلل، موقعها فيه)
+        self.total_pages = 0
+        self.total_bytes = 0
+        self._new_canvas()
+
+    def _new_canvas(self):
+        self.packet = BytesIO()
+        self.canvas = canvas.Canvas(self.packet)
+        self.index: Dict[int, int] = {}  # رقم الصفحة الأصلية ← موقعها في اللوحة الحالية
+
+    def __contains__(self, page_num: int) -> bool:
+        return page_num in self.index or page_num in self.parts
+
+    def draw(self, page_num: int, page_size: Tuple[float, float], draw_page: Callable):
+        """رسم طبقة صفحة واحدة كصفحة جديدة في المستند المشترك"""
+        with self.lock:
+            self.canvas.setPageSize((float(page_size[0]), float(page_size[1])))
+            try:
+                draw_page(self.canvas)
+            finally:
+                self.canvas.showPage()
+                self.index[page_num] = len(self.index)
+
+    def take(self) -> Tuple[Optional[bytes], Dict[int, int]]:
+        """حفظ الصفحات المرسومة وإرجاع المستند مع مواقع صفحاته ثم بدء لوحة جديدة"""
+        with self.lock:
+            if not self.index:
+                return None, {}
+            self.canvas.save()
+            data, index = self.packet.getvalue(), self.index
+            self._new_canvas()
+        return data, index
+
+    def attach(self, data: Optional[bytes], index: Dict[int, int]):
+        """تحليل مستند طبقات مرة واحدة وتسجيل صفحاته للدمج"""
+        if not data:
+            return
+        reader = PdfReader(BytesIO(data))
+        with self.lock:
+            for page_num, position in index.items():
+                self.parts[page_num] = (reader, position)
+            self.total_pages += len(index)
+            self.total_bytes += len(data)
+        self.logger.debug(f"مستند طبقات واحد لـ {len(index)} صفحة ({len(data) / 1024:.0f} KB)")
+
+    def finish(self):
+        """حفظ الصفحات المرسومة حتى الآن وتحليلها مرة واحدة للدمج"""
+        self.attach(*self.take())
+
+    def page(self, page_num: int) -> Optional[object]:
+        """صفحة الطبقة المقابلة للصفحة الأصلية (بعد finish أو attach)
+
+        الصفحة تسلم مرة واحدة، فيحرر المستند المحلل بعد دمج كل صفحاته.
+        """
+        with self.lock:
+            part = self.parts.pop(page_num, None)
+        if part is None:
+            return None
+        reader, position = part
+        return reader.pages[position]
+
+    def stats(self) -> Dict:
+        return {
+            'overlay_pages': self.total_pages,
+            'overlay_bytes': self.total_bytes
+        }
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Page Checkpoint Journal
+Created: 2025-02-12 19:48:30
+Author: x9ci
+"""
+# page_journal.py
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def file_fingerprint(file_path) -> str:
+    """بصمة محتوى الملف لربط السجل بنسخة محددة منه"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageJournal:
+    """سجل على القرص للصفحات المكتملة (الكتل المترجمة وطبقة الترجمة)
+
+    مع مستند الطبقات المشترك تسجل الكتل وحدها، وتعاد الصفحة المستأنفة برسم
+    كتلها في المستند المشترك.
+    """
+
+    def __init__(self, journal_dir, input_path, settings: Dict = None, fingerprint: str = None):
+        self.logger = logging.getLogger(__name__)
+        self.input_path = Path(input_path)
+        self.fingerprint = fingerprint or file_fingerprint(self.input_path)
+        self.settings = settings or {}
+        self.dir = Path(journal_dir) / f"{self.input_path.stem}_{self.fingerprint[:12]}"
+        self.pages_dir = self.dir / "pages"
+        self.manifest_path = self.dir / "manifest.json"
+
+    def open(self, resume: bool = False) -> Set[int]:
+        """تجهيز السجل وإرجاع الصفحات المكتملة عند الاستئناف"""
+        if resume and self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('fingerprint') == self.fingerprint and \
+                        manifest.get('settings') == self.settings:
+                    completed = self.completed_pages()
+                    self.logger.info(f"استئناف الترجمة: {len(completed)} صفحة مكتملة في السجل")
+                    return completed
+                self.logger.warning("إعدادات السجل لا تطابق المهمة الحالية، البدء من جديد")
+            except Exception as e:
+                self.logger.warning(f"تعذر قراءة سجل الصفحات: {str(e)}")
+
+        self.clear()
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self.manifest_path, json.dumps({
+            'source': str(self.input_path),
+            'fingerprint': self.fingerprint,
+            'settings': self.settings,
+            'created': datetime.now().isoformat()
+        }, ensure_ascii=False, indent=2).encode('utf-8'))
+        return set()
+
+    def completed_pages(self) -> Set[int]:
+        """أرقام الصفحات المسجلة كمكتملة"""
+        if not self.pages_dir.exists():
+            return set()
+        return {int(p.stem) for p in self.pages_dir.glob("*.json") if p.stem.isdigit()}
+
+    def record(self, page_num: int, translated_blocks: List[Dict], overlay_packet: Optional[BytesIO]):
+        """تسجيل صفحة مكتملة (ملف JSON يكتب أخيراً كعلامة اكتمال)"""
+        try:
+            has_overlay = overlay_packet is not None
+            if has_overlay:
+                self._write_atomic(self.pages_dir / f"{page_num:05d}.pdf", overlay_packet.getvalue())
+            self._write_atomic(self.pages_dir / f"{page_num:05d}.json", json.dumps({
+                'page': page_num,
+                'has_overlay': has_overlay,
+                'blocks': translated_blocks or []
+            }, ensure_ascii=False).encode('utf-8'))
+        except Exception as e:
+            self.logger.warning(f"خطأ في تسجيل الصفحة {page_num + 1}: {str(e)}")
+
+    def load(self, page_num: int) -> Tuple[List[Dict], Optional[BytesIO]]:
+        """قراءة صفحة مكتملة من السجل"""
+        with open(self.pages_dir / f"{page_num:05d}.json", 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        overlay_packet = None
+        if entry.get('has_overlay'):
+            with open(self.pages_dir / f"{page_num:05d}.pdf", 'rb') as f:
+                overlay_packet = BytesIO(f.read())
+        return entry.get('blocks', []), overlay_packet
+
+    def clear(self):
+        """حذف السجل بعد اكتمال المهمة"""
+        try:
+            if self.dir.exists():
+                shutil.rmtree(self.dir)
+        except Exception as e:
+            self.logger.warning(f"خطأ في حذف سجل الصفحات: {str(e)}")
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming Page Pipeline
+Created: 2025-02-11 13:05:12
+Author: x9ci
+"""
+# page_pipeline.py
+
+import logging
+import queue
+import threading
+from typing import List
+
+# علامة نهاية الصفحات في الطوابير
+_DONE = object()
+
+
+class PagePipeline:
+    """خط معالجة بمراحل متداخلة: استخراج ← ترجمة ← رسم ← دمج
+
+    الطوابير بين المراحل محدودة، وعدد الصفحات قيد المعالجة محدود أيضاً
+    حتى تبقى الذاكرة ثابتة مهما كان حجم الملف.
+    """
+
+    def __init__(self, pdf_handler, queue_depth: int = 4, translation_threads: int = 2):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_handler = pdf_handler
+        self.page_processor = pdf_handler.page_processor
+        self.queue_depth = max(1, queue_depth)
+        self.translation_threads = max(1, translation_threads)
+
+    def run(self, document, page_numbers: List[int]):
+        """تشغيل خط المعالجة وإرجاع (رقم الصفحة، الكتل، الطبقة، فشل) بترتيب الصفحات"""
+        extracted = queue.Queue(maxsize=self.queue_depth)
+        translated = queue.Queue(maxsize=self.queue_depth)
+        # طابور الإخراج محدود عملياً بعدد الصفحات المسموح بها، ولا يحجب مرحلة الرسم
+        rendered = queue.Queue()
+        # عدد الصفحات المسموح بها في الخط في آن واحد (يشمل مخزن إعادة الترتيب)
+        page_slots = threading.Semaphore(self.queue_depth * 2)
+        stop = threading.Event()
+
+        threads = [threading.Thread(
+            target=self._extract_stage,
+            args=(document, page_numbers, extracted, page_slots, stop),
+            name="pipeline-extract", daemon=True
+        )]
+        threads += [threading.Thread(
+            target=self._translate_stage, args=(extracted, translated),
+            name=f"pipeline-translate-{i}", daemon=True
+        ) for i in range(self.translation_threads)]
+        threads.append(threading.Thread(
+            target=self._render_stage, args=(translated, rendered),
+            name="pipeline-render", daemon=True
+        ))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            # مرحلة الدمج: إعادة الترتيب وإرجاع الصفحات بالتسلسل
+            pending = {}
+            position = 0
+            while True:
+                item = rendered.get()
+                if item is _DONE:
+                    break
+                page_num, translated_blocks, overlay_packet, failed = item
+                pending[page_num] = (translated_blocks, overlay_packet, failed)
+                while position < len(page_numbers) and page_numbers[position] in pending:
+                    next_page = page_numbers[position]
+                    yield (next_page,) + pending.pop(next_page)
+                    page_slots.release()
+                    position += 1
+
+            # الصفحات المتبقية في حالة خطأ غير متوقع في إحدى المراحل
+            for page_num in page_numbers[position:]:
+                yield (page_num,) + pending.pop(page_num, ([], None, True))
+        finally:
+            stop.set()
+            # تحرير المراحل المنتظرة إذا توقف المستهلك مبكراً
+            for _ in range(len(page_numbers)):
+                page_slots.release()
+
+    def _extract_stage(self, document, page_numbers, extracted, page_slots, stop):
+        try:
+            for page_num in page_numbers:
+                page_slots.acquire()
+                if stop.is_set():
+                    break
+                failed = False
+                try:
+                    page = document.plumber_page(page_num)
+                    # الصفحات الممسوحة (None) تقرأ ضوئياً في خيوط الترجمة حتى لا يتوقف الاستخراج
+                    text_content = self.pdf_handler.extract_page_content(page, page_num, recognize=False)
+                    page_size = (float(page.width), float(page.height))
+                    document.release_page(page_num)
+                except Exception as e:
+                    self.logger.error(f"خطأ في استخراج الصفحة {page_num + 1}: {str(e)}")
+                    text_content, page_size, failed = [], None, True
+                extracted.put((page_num, text_content, page_size, failed))
+        finally:
+            for _ in range(self.translation_threads):
+                extracted.put(_DONE)
+
+    def _translate_stage(self, extracted, translated):
+        try:
+            while True:
+                item = extracted.get()
+                if item is _DONE:
+                    break
+                page_num, text_content, page_size, failed = item
+                translated_blocks = []
+                if text_content is None and not failed:
+                    try:
+                        text_content = self.pdf_handler.recognize_page(page_num)
+                    except Exception as e:
+                        self.logger.error(str(e))
+                        failed = True
+                if text_content:
+                    try:
+                        translated_blocks, failed = self.page_processor.process_page(text_content, page_num)
+                    except Exception as e:
+                        self.logger.error(f"خطأ في ترجمة الصفحة {page_num + 1}: {str(e)}")
+                        failed = True
+                translated.put((page_num, translated_blocks, page_size, failed))
+        finally:
+            translated.put(_DONE)
+
+    def _render_stage(self, translated, rendered):
+        finished = 0
+        try:
+            while finished < self.translation_threads:
+                item = translated.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                page_num, translated_blocks, page_size, failed = item
+                overlay_packet = None
+                if translated_blocks and page_size:
+                    try:
+                        overlay_packet = self.page_processor.create_translated_overlay(
+                            translated_blocks, page_num, page_size
+                        )
+                    except Exception as e:
+                        self.logger.error(f"خطأ في رسم الصفحة {page_num + 1}: {str(e)}")
+                        failed = True
+                rendered.put((page_num, translated_blocks, overlay_packet, failed))
+        finally:
+            rendered.put(_DONE)
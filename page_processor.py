@@ -12,7 +12,8 @@ from io import BytesIO
 from typing import List, Dict, Tuple
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+from font_registry import ensure_arabic_font
 
 class PageProcessor:
     def __init__(self):
@@ -22,27 +23,7 @@ class PageProcessor:
 
     def initialize_fonts(self):
         """تهيئة الخطوط العربية"""
-        try:
-            font_paths = [
-                "/usr/share/fonts/truetype/arabic/Amiri-Regular.ttf",
-                "./fonts/Amiri-Regular.ttf",
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-                "./fonts/FreeSans.ttf"
-            ]
-
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                        pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                        print(f"تم تحميل الخط: {font_path}")
-                        return True
-
-            print("تحذير: لم يتم العثور على خط عربي مناسب")
-            return False
-
-        except Exception as e:
-            print(f"خطأ في تهيئة الخطوط: {e}")
-            return False
+        return ensure_arabic_font(self.font_name)
 
     def create_translated_overlay(self, blocks: List[Dict], page_size: Tuple[float, float]) -> BytesIO:
         """إنشاء طبقة الترجمة"""
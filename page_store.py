@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental Page Result Store
+Created: 2025-02-20 16:47:15
+Author: x9ci
+"""
+# page_store.py
+
+import hashlib
+import json
+import logging
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+
+class PageHasher:
+    """بصمة الصفحة: تيار المحتوى والموارد وأبعاد الصفحة وإعدادات المعالجة
+
+    البصمة مستقلة عن أرقام الكائنات في الملف حتى تبقى ثابتة بين الإصدارات،
+    وبصمات الكائنات المشتركة (الخطوط والصور) تحسب مرة واحدة لكل مستند.
+    """
+
+    PAGE_KEYS = ('/Contents', '/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+    def __init__(self, settings: Dict = None):
+        self.settings = json.dumps(settings or {}, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        self.object_digests = {}
+
+    def hash_page(self, page_obj) -> str:
+        digest = hashlib.sha1(self.settings)
+        for key in self.PAGE_KEYS:
+            digest.update(key.encode('utf-8'))
+            if key in page_obj:
+                self._feed(digest, page_obj.raw_get(key))
+        return digest.hexdigest()
+
+    def _feed(self, digest, obj):
+        if isinstance(obj, IndirectObject):
+            ref = (obj.idnum, obj.generation)
+            if ref not in self.object_digests:
+                # علامة مؤقتة لكسر الإشارات الدائرية
+                self.object_digests[ref] = b'<cycle>'
+                sub_digest = hashlib.sha1()
+                self._feed(sub_digest, obj.get_object())
+                self.object_digests[ref] = sub_digest.digest()
+            digest.update(self.object_digests[ref])
+        elif isinstance(obj, StreamObject):
+            digest.update(b'<stream>')
+            for key in sorted(obj.keys()):
+                if key not in ('/Length', '/Filter', '/DecodeParms'):
+                    digest.update(str(key).encode('utf-8'))
+                    self._feed(digest, obj.raw_get(key))
+            digest.update(obj.get_data())
+        elif isinstance(obj, DictionaryObject):
+            digest.update(b'<<')
+            for key in sorted(obj.keys()):
+                # الإشارة إلى الصفحة الأم تربط البصمة ببنية الملف كاملة
+                if key == '/Parent':
+                    continue
+                digest.update(str(key).encode('utf-8'))
+                self._feed(digest, obj.raw_get(key))
+            digest.update(b'>>')
+        elif isinstance(obj, ArrayObject):
+            digest.update(b'[')
+            for item in obj:
+                self._feed(digest, item)
+            digest.update(b']')
+        else:
+            digest.update(repr(obj).encode('utf-8'))
+
+
+class PageResultStore:
+    """مخزن دائم لنتائج الصفحات (الكتل المترجمة وطبقة الترجمة) حسب بصمة المحتوى
+
+    مع مستند الطبقات المشترك تخزن الكتل وحدها، وتعاد الصفحة المستعملة برسم
+    كتلها في المستند المشترك.
+    """
+
+    def __init__(self, store_dir):
+        self.logger = logging.getLogger(__name__)
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.store_dir / key[:2] / f"{key}{suffix}"
+
+    def contains(self, key: str) -> bool:
+        return self._path(key, '.json').exists()
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict], Optional[BytesIO]]]:
+        """قراءة نتيجة صفحة محفوظة"""
+        try:
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            overlay_packet = None
+            if entry.get('has_overlay'):
+                with open(self._path(key, '.pdf'), 'rb') as f:
+                    overlay_packet = BytesIO(f.read())
+            return entry.get('blocks', []), overlay_packet
+        except Exception as e:
+            self.logger.warning(f"تعذر قراءة نتيجة الصفحة المحفوظة: {str(e)}")
+            return None
+
+    def put(self, key: str, translated_blocks: List[Dict], overlay_packet: Optional[BytesIO]):
+        """حفظ نتيجة صفحة (ملف JSON يكتب أخيراً كعلامة اكتمال)"""
+        try:
+            self._path(key, '').parent.mkdir(parents=True, exist_ok=True)
+            has_overlay = overlay_packet is not None
+            if has_overlay:
+                self._write_atomic(self._path(key, '.pdf'), overlay_packet.getvalue())
+            self._write_atomic(self._path(key, '.json'), json.dumps({
+                'has_overlay': has_overlay,
+                'blocks': translated_blocks or []
+            }, ensure_ascii=False).encode('utf-8'))
+        except Exception as e:
+            self.logger.warning(f"خطأ في حفظ نتيجة الصفحة: {str(e)}")
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel Page Rendering
+Created: 2025-02-10 09:27:44
+Author: x9ci
+"""
+# parallel_pages.py
+
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from document_session import DocumentSession
+from logging_setup import setup_worker_logging, worker_logging_args
+from metrics import REGISTRY
+from overlay_document import OverlayDocument
+
+# معالج PDF الخاص بكل عملية عاملة
+_worker_handler = None
+# المستند المفتوح في العملية العاملة (يحلل مرة واحدة لجميع النطاقات)
+_worker_document = None
+
+
+def split_page_ranges(page_numbers: List[int], workers: int, ranges_per_worker: int = 4) -> List[List[int]]:
+    """تقسيم الصفحات إلى نطاقات متتالية لتوزيعها على العمليات"""
+    if not page_numbers:
+        return []
+    range_size = max(1, math.ceil(len(page_numbers) / (max(1, workers) * ranges_per_worker)))
+    return [page_numbers[start:start + range_size]
+            for start in range(0, len(page_numbers), range_size)]
+
+
+def init_worker(handler_factory, config, workers: int, pretranslated: Dict[str, str] = None,
+                log_args: tuple = ()):
+    """تهيئة مكونات الترجمة مرة واحدة في كل عملية عاملة"""
+    global _worker_handler
+    setup_worker_logging(*log_args)
+    # القيم الموروثة من العملية الأم لا تعاد إليها مع مقاييس العامل
+    REGISTRY.drain()
+    _worker_handler = handler_factory(config, workers)
+    if pretranslated:
+        _worker_handler.page_processor.text_processor.pretranslated.update(pretranslated)
+    # المجلد المؤقت لا يستخدم داخل العامل
+    _worker_handler.cleanup()
+
+
+def render_page_range(input_path: str, page_range: List[int], page_blocks: Dict[int, List[Dict]] = None
+                      ) -> Tuple[List[Tuple[int, List[Dict], Optional[bytes], bool]], Tuple, Dict]:
+    """استخراج وترجمة ورسم طبقات نطاق من الصفحات داخل العامل (الكتل المستخرجة مسبقاً لا يعاد استخراجها)
+
+    تعيد نتائج الصفحات، ومستند طبقات النطاق مع مواقع صفحاته عند تفعيل مستند
+    الطبقات المشترك (فيضمن الخط مرة واحدة للنطاق)، ومقاييس العامل المتراكمة
+    أثناء النطاق لدمجها في العملية الأم.
+    """
+    overlay_document = None
+    if getattr(_worker_handler.config, 'SINGLE_OVERLAY_ENABLED', False):
+        overlay_document = OverlayDocument()
+    _worker_handler.page_processor.overlay_document = overlay_document
+    document = worker_document(input_path)
+    # مسار الملف للتعرف الضوئي على الصفحات الممسوحة داخل العامل
+    _worker_handler.current_pdf_path = str(input_path)
+    if page_blocks:
+        _worker_handler.extracted_pages.update(page_blocks)
+    results = []
+    for page_num in page_range:
+        try:
+            translated_blocks, overlay, failed = _worker_handler.render_page(document.plumber_page(page_num), page_num)
+            document.release_page(page_num)
+            results.append((page_num, translated_blocks, overlay.getvalue() if overlay else None, failed))
+        except Exception as e:
+            logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
+            results.append((page_num, [], None, True))
+    _worker_handler.page_processor.overlay_document = None
+    overlay = overlay_document.take() if overlay_document is not None else (None, {})
+    return results, overlay, REGISTRY.drain()
+
+
+def worker_document(input_path: str) -> DocumentSession:
+    """فتح المستند مرة واحدة في كل عملية عاملة"""
+    global _worker_document
+    if _worker_document is None or str(_worker_document.input_path) != str(input_path):
+        if _worker_document is not None:
+            _worker_document.close()
+        _worker_document = DocumentSession(
+            input_path, release_pages=getattr(_worker_handler.config, 'LOW_MEMORY_MODE', False)
+        ).open()
+    return _worker_document
+
+
+def render_pages_parallel(handler_factory, config, input_path: str, page_numbers: List[int], workers: int,
+                          pretranslated: Dict[str, str] = None, page_blocks: Dict[int, List[Dict]] = None,
+                          overlay_document: OverlayDocument = None):
+    """رسم طبقات الصفحات في مجمع عمليات وإرجاعها بترتيب الصفحات
+
+    مستند طبقات كل نطاق يلحق بـ overlay_document قبل إرجاع صفحاته.
+    """
+    page_ranges = split_page_ranges(page_numbers, workers)
+    # كل نطاق يرسل مع كتله المستخرجة مسبقاً فقط
+    page_blocks = page_blocks or {}
+    range_blocks = [{page_num: page_blocks.pop(page_num) for page_num in page_range if page_num in page_blocks}
+                    for page_range in page_ranges]
+    logging.info(f"معالجة {len(page_numbers)} صفحة في {len(page_ranges)} نطاق باستخدام {workers} عملية")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(handler_factory, config, workers, pretranslated,
+                                       worker_logging_args())) as executor:
+        for results, overlay, metrics in executor.map(render_page_range, [input_path] * len(page_ranges), page_ranges, range_blocks):
+            REGISTRY.merge(metrics)
+            if overlay_document is not None:
+                overlay_document.attach(*overlay)
+            for page_num, translated_blocks, overlay_bytes, failed in results:
+                yield page_num, translated_blocks, BytesIO(overlay_bytes) if overlay_bytes else None, failed
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Overlay Placement Index
+Created: 2025-02-15 17:31:26
+Author: x9ci
+"""
+# placement.py
+
+import math
+from typing import List, Tuple
+
+Rect = Tuple[float, float, float, float]  # (x, y, width, height)
+
+
+class GridIndex:
+    """فهرس شبكي للمستطيلات المستخدمة: البحث عن التداخل يفحص الخلايا المجاورة فقط"""
+
+    def __init__(self, cell_size: float = 40.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.rects: List[Rect] = []
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __iter__(self):
+        return iter(self.rects)
+
+    def _cells_for(self, rect: Rect):
+        x, y, w, h = rect
+        size = self.cell_size
+        for cx in range(math.floor(x / size), math.floor((x + max(w, 0)) / size) + 1):
+            for cy in range(math.floor(y / size), math.floor((y + max(h, 0)) / size) + 1):
+                yield cx, cy
+
+    def insert(self, rect: Rect):
+        """إضافة مستطيل إلى الفهرس"""
+        rect_id = len(self.rects)
+        self.rects.append(rect)
+        for cell in self._cells_for(rect):
+            self.cells.setdefault(cell, []).append(rect_id)
+
+    # للتوافق مع الشيفرة التي تستخدم قائمة المواقع
+    append = insert
+
+    def find_overlaps(self, rect: Rect) -> List[Rect]:
+        """جميع المستطيلات المتداخلة مع المستطيل المعطى"""
+        x, y, w, h = rect
+        seen = set()
+        overlaps = []
+        for cell in self._cells_for(rect):
+            for rect_id in self.cells.get(cell, ()):
+                if rect_id in seen:
+                    continue
+                seen.add(rect_id)
+                used_x, used_y, used_w, used_h = self.rects[rect_id]
+                if (x < used_x + used_w and x + w > used_x and
+                        y < used_y + used_h and y + h > used_y):
+                    overlaps.append(self.rects[rect_id])
+        return overlaps
+
+
+def find_free_position(index: GridIndex, bbox, text_width: float, text_height: float,
+                       page_width: float, page_height: float,
+                       margin: float = 5, gap: float = 5) -> Tuple[float, float]:
+    """إيجاد موقع غير متداخل للنص المترجم
+
+    عند التداخل ينتقل الموقع مباشرة إلى أسفل أدنى مستطيل متداخل بدلاً من
+    النزول خطوة ثابتة، ثم إلى العمود التالي. كل خطوة تنقص y أو تزيد x، لذا
+    ينتهي البحث دائماً، وفي أسوأ الحالات يعود إلى أعلى يسار الصفحة.
+    """
+    top = page_height - text_height - margin
+    x = max(margin, min(bbox[0], page_width - text_width - margin))
+    y = max(margin, min(page_height - bbox[3] - text_height - gap, top))
+
+    max_steps = 4 * len(index) + 100
+    for _ in range(max_steps):
+        overlaps = index.find_overlaps((x, y, text_width, text_height))
+        if not overlaps:
+            return x, y
+
+        y = min(used_y for _, used_y, _, _ in overlaps) - text_height - gap
+        if y < margin:
+            # الانتقال إلى العمود التالي من أعلى الصفحة
+            y = top
+            x += text_width + 10
+            if x + text_width > page_width - margin:
+                break
+
+    return margin, top
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Glyph Width Measurement
+Created: 2025-02-22 14:06:31
+Author: x9ci
+"""
+# text_metrics.py
+
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+
+# عرض تقديري للحرف (نسبة من حجم الخط) عندما يكون الخط غير مسجل بعد
+FALLBACK_CHAR_WIDTH = 0.6
+
+
+@lru_cache(maxsize=50000)
+def _unit_width(font_name: str, text: str) -> float:
+    """عرض النص بحجم خط 1 (قياس reportlab المسرع بلغة C، ويحفظ لكل نص مشكل)"""
+    return pdfmetrics.stringWidth(text, font_name, 1)
+
+
+def string_width(text: str, font_name: str = 'Arabic', font_size: float = 12) -> float:
+    """عرض النص المشكل بالنقاط"""
+    try:
+        pdfmetrics.getFont(font_name)
+    except KeyError:
+        # الخط لم يسجل بعد: لا يحفظ التقدير حتى يقاس النص بالخط بعد تسجيله
+        return len(text) * font_size * FALLBACK_CHAR_WIDTH
+    return _unit_width(font_name, text) * font_size
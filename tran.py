@@ -8,124 +8,50 @@ Author: x9ci
 
 from reportlab.lib.pagesizes import letter
 import pdfplumber
-import pytesseract
-from pdf2image import convert_from_path
-from googletrans import Translator
 import re
 import logging
-from PIL import Image, ImageFont
 import os
 from pathlib import Path
 import shutil
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 import tempfile
 from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
-import arabic_reshaper
-from bidi.algorithm import get_display
 import sys
 import time
 import json
-from tqdm import tqdm
+import asyncio
 import logging
 
 # واردات المكونات المحلية (من نفس المجلد)
 from arabic_handler import ArabicTextHandler  # تم تغيير الاسم هنا
 from page_processor import PageProcessor
-
-
-def check_font_paths(self):
-    """التحقق من مسارات الخطوط المتوفرة"""
-    import os
-    
-    # القائمة الافتراضية للمجلدات المحتملة للخطوط
-    possible_font_dirs = [
-        "/usr/share/fonts",
-        "/usr/local/share/fonts",
-        os.path.expanduser("~/.fonts"),
-        os.path.expanduser("~/Library/Fonts"),  # لنظام MacOS
-        "C:\\Windows\\Fonts",  # لنظام Windows
-        "./fonts"  # المجلد المحلي
-    ]
-    
-    found_fonts = []
-    
-    print("\nجاري البحث عن الخطوط المتوفرة...")
-    for font_dir in possible_font_dirs:
-        if os.path.exists(font_dir):
-            print(f"\nالبحث في المجلد: {font_dir}")
-            for root, dirs, files in os.walk(font_dir):
-                for file in files:
-                    if file.lower().endswith(('.ttf', '.otf')):
-                        if any(arabic_font in file.lower() for arabic_font in ['arab', 'amiri', 'noto', 'freesans']):
-                            full_path = os.path.join(root, file)
-                            found_fonts.append(full_path)
-                            print(f"تم العثور على خط: {full_path}")
-    
-    return found_fonts
-
-# تعديل دالة initialize_fonts
-def initialize_fonts(self):
-    """تهيئة الخطوط العربية"""
-    try:
-        font_paths = [
-            "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-            "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-            "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
-            "./fonts/Amiri-Regular.ttf",
-            "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-            "./fonts/FreeSans.ttf"
-        ]
-
-        loaded_fonts = []
-
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                        pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                        logging.info(f"تم تحميل الخط: {font_path}")
-                        loaded_fonts.append(font_path)
-                        return True
-                except Exception as e:
-                    logging.warning(f"فشل تحميل الخط {font_path}: {str(e)}")
-                    continue
-
-        if not loaded_fonts:
-            logging.warning("لم يتم العثور على أي خط عربي. جاري محاولة تنزيل خط Amiri...")
-            if self.download_amiri_font():
-                return self.initialize_fonts()  # إعادة المحاولة بعد التنزيل
-
-        return bool(loaded_fonts)
-
-    except Exception as e:
-        logging.error(f"خطأ في تهيئة الخطوط: {str(e)}")
-        return False
-
-def download_amiri_font(self):
-    """تنزيل خط أميري"""
-    import urllib.request
-    import os
-    
-    try:
-        font_url = "https://github.com/google/fonts/raw/main/ofl/amiri/Amiri-Regular.ttf"
-        font_dir = "./fonts"
-        font_path = os.path.join(font_dir, "Amiri-Regular.ttf")
-        
-        # إنشاء مجلد الخطوط إذا لم يكن موجوداً
-        os.makedirs(font_dir, exist_ok=True)
-        
-        print("جاري تنزيل خط أميري...")
-        urllib.request.urlretrieve(font_url, font_path)
-        print(f"تم تنزيل الخط بنجاح إلى: {font_path}")
-        
-    except Exception as e:
-        print(f"خطأ في تنزيل الخط: {e}")
-
+from translation_cache import TranslationMemory
+from async_translation import (
+    TokenBucket, AsyncTranslationEngine, run_coroutine, is_retryable_error, backoff_delay
+)
+from batch_translation import split_text_into_chunks, pack_requests, merge_chunks
+from translation_backends import create_backend, BatchMismatchError
+from parallel_pages import render_pages_parallel
+from page_pipeline import PagePipeline
+from page_journal import PageJournal
+from document_dedup import DocumentDeduplicator
+from placement import GridIndex, find_free_position
+from layout import LayoutAnalyzer
+from document_session import DocumentSession
+from low_memory import SegmentedPdfWriter, peak_rss_mb
+from ocr_pages import OCRError, is_image_only_page, ocr_page, tesseract_available
+from page_store import PageHasher, PageResultStore
+from arabic_shaping import shape_arabic_text, shaping_stats
+from text_metrics import string_width
+from font_registry import configure_font_registry, ensure_arabic_font
+from overlay_document import OverlayDocument
+from batch_jobs import BatchTranslator, collect_input_files, is_batch_source
+from metrics import REGISTRY, DOCUMENT_BUCKETS, MetricsExporter
+from logging_setup import setup_logging, stop_logging
+import chess_notation
 
 
 # تهيئة التسجيل
@@ -136,6 +62,24 @@ logging.basicConfig(
 
 VERSION = '1.0.0'  # إضافة إصدار البرنامج هنا
 
+# مقاييس المعالجة (تصدر إلى ملف عند تحديد PDF_METRICS_PATH)
+DOCUMENTS_METRIC = REGISTRY.counter('documents_total', "الملفات المكتملة")
+DOCUMENTS_FAILED_METRIC = REGISTRY.counter('documents_failed_total', "الملفات الفاشلة")
+DOCUMENT_SECONDS = REGISTRY.histogram('document_seconds', "زمن ترجمة الملف كاملاً", DOCUMENT_BUCKETS)
+PAGES_METRIC = REGISTRY.counter('pages_total', "الصفحات المضافة إلى الملفات الناتجة")
+PAGES_PER_SECOND = REGISTRY.gauge('pages_per_second', "سرعة معالجة الملف الحالي")
+PAGE_SECONDS = REGISTRY.histogram('page_process_seconds', "زمن ترجمة كتل الصفحة")
+BLOCKS_SKIPPED_METRIC = REGISTRY.counter('blocks_skipped_total', "الكتل المستبعدة من الترجمة (قصيرة أو نقلات شطرنج)")
+BATCH_SECONDS = REGISTRY.histogram('text_batch_seconds', "زمن معالجة دفعة نصوص")
+CHARS_SENT_METRIC = REGISTRY.counter('translation_chars_sent_total', "الأحرف المرسلة إلى محرك الترجمة")
+NOTATION_CHARS_METRIC = REGISTRY.counter('notation_chars_masked_total', "أحرف نقلات الشطرنج المستبقاة دون ترجمة")
+CACHE_HITS_METRIC = REGISTRY.counter('translation_cache_hits_total', "نصوص وجدت في ذاكرة الترجمة أو المرور المسبق")
+CACHE_MISSES_METRIC = REGISTRY.counter('translation_cache_misses_total', "نصوص أرسلت للترجمة")
+OVERLAY_SECONDS = REGISTRY.histogram('overlay_render_seconds', "زمن رسم طبقة الترجمة")
+OVERLAY_BLOCKS_METRIC = REGISTRY.counter('overlay_blocks_drawn_total', "الكتل المرسومة في طبقات الترجمة")
+OCR_PAGES_METRIC = REGISTRY.counter('ocr_pages_total', "الصفحات الممسوحة المقروءة ضوئياً")
+OCR_FAILED_METRIC = REGISTRY.counter('ocr_pages_failed_total', "الصفحات الممسوحة التي تعذرت قراءتها")
+
 
 def initialize_system():
     """تهيئة النظام والتحقق من المتطلبات"""
@@ -157,14 +101,6 @@ def initialize_system():
         print(f"خطأ في تهيئة النظام: {e}")
         return False
 
-if __name__ == "__main__":
-    if not initialize_system():
-        print("فشل في تهيئة النظام")
-        sys.exit(1)
-        
-    # متابعة تنفيذ البرنامج...
-    print("تم تهيئة النظام بنجاح")
-
 def __init__(self, text_processor):
     self.text_processor = text_processor
     self.batch_size = 10
@@ -173,6 +109,7 @@ def __init__(self, text_processor):
 
 class TextProcessor:
     def __init__(self):
+        from googletrans import Translator
         self.translator = Translator()
         self.batch_size = 10
 
@@ -193,13 +130,8 @@ class TextProcessor:
         return any(bool(re.match(pattern, text.strip())) for pattern in patterns)
 
     def prepare_arabic_text(self, text: str) -> str:
-        try:
-            reshaped_text = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped_text)
-            return text
-        except Exception as e:
-            logging.error(f"Error preparing Arabic text: {str(e)}")
-            return text
+        # النص يبقى بترتيبه المنطقي، والتشكيل يتم مرة واحدة عند الرسم
+        return text
 
     def process_text_batch(self, texts: List[str]) -> List[str]:
         """معالجة مجموعة من النصوص"""
@@ -241,101 +173,31 @@ class FontManager:
 
     def initialize_fonts(self):
         """تهيئة الخطوط العربية"""
-        try:
-            font_paths = [
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
-                "./fonts/Amiri-Regular.ttf",
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-                "./fonts/FreeSans.ttf",
-                os.path.expanduser("~/.fonts/Amiri-Regular.ttf"),
-                os.path.expanduser("~/.local/share/fonts/Amiri-Regular.ttf")
-            ]
-
-            loaded_fonts = []
-
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                            logging.info(f"تم تحميل الخط: {font_path}")
-                            loaded_fonts.append(font_path)
-                            return True
-                    except Exception as e:
-                        logging.warning(f"فشل تحميل الخط {font_path}: {str(e)}")
-                        continue
-
-            if not loaded_fonts:
-                logging.warning("لم يتم العثور على أي خط عربي. جاري محاولة تنزيل خط Amiri...")
-                if self.download_amiri_font():
-                    return self.initialize_fonts()  # إعادة المحاولة بعد التنزيل
-
-            return bool(loaded_fonts)
-
-        except Exception as e:
-            logging.error(f"خطأ في تهيئة الخطوط: {str(e)}")
-            return False
+        return ensure_arabic_font(self.font_name)
 
 
 class ArabicWriter:
     def __init__(self):
+        self.font_name = 'Arabic'
         self.font_size = 14
         self.initialize_fonts()
 
     def initialize_fonts(self):
         """تهيئة الخطوط العربية"""
-        try:
-            font_paths = [
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
-                "./fonts/Amiri-Regular.ttf",
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-                "./fonts/FreeSans.ttf",
-                os.path.expanduser("~/.fonts/Amiri-Regular.ttf"),
-                os.path.expanduser("~/.local/share/fonts/Amiri-Regular.ttf")
-            ]
-
-            loaded_fonts = []
-
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                            logging.info(f"تم تحميل الخط: {font_path}")
-                            loaded_fonts.append(font_path)
-                            return True
-                    except Exception as e:
-                        logging.warning(f"فشل تحميل الخط {font_path}: {str(e)}")
-                        continue
-
-            if not loaded_fonts:
-                logging.warning("لم يتم العثور على أي خط عربي. جاري محاولة تنزيل خط Amiri...")
-                if self.download_amiri_font():
-                    return self.initialize_fonts()  # إعادة المحاولة بعد التنزيل
-
-            return bool(loaded_fonts)
-
-        except Exception as e:
-            logging.error(f"خطأ في تهيئة الخطوط: {str(e)}")
-            return False
+        return ensure_arabic_font(self.font_name)
 
     def write_arabic_text(self, canvas, text, x, y, width=None, height=None, align='right'):
         """كتابة نص عربي على الصفحة"""
         try:
             # معالجة النص العربي
-            reshaped_text = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped_text)
+            bidi_text = shape_arabic_text(text)
 
             # تعيين الخط والحجم
             canvas.setFont('Arabic', self.font_size)
 
             # حساب العرض إذا لم يتم تحديده
             if width is None:
-                width = canvas.stringWidth(bidi_text, 'Arabic', self.font_size)
+                width = string_width(bidi_text, 'Arabic', self.font_size)
 
             # تحديد موقع الكتابة حسب المحاذاة
             if align == 'right':
@@ -350,21 +212,42 @@ class ArabicWriter:
             return width, self.font_size
 
         except Exception as e:
-            print(f"خطأ في كتابة النص العربي: {e}")
+            logging.warning(f"خطأ في كتابة النص العربي: {e}")
             return 0, 0
 
     def get_text_dimensions(self, text):
         """حساب أبعاد النص"""
         try:
-            reshaped_text = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped_text)
-            width = len(bidi_text) * self.font_size * 0.6
+            bidi_text = shape_arabic_text(text)
+            width = string_width(bidi_text, 'Arabic', self.font_size)
             height = self.font_size * 1.5
             return width, height
         except Exception as e:
-            print(f"خطأ في حساب أبعاد النص: {e}")
+            logging.warning(f"خطأ في حساب أبعاد النص: {e}")
             return 0, 0
 
+    def wrap_text(self, text, max_width):
+        """تقسيم النص إلى أسطر لا يتجاوز عرض كل منها العرض المحدد"""
+        words = text.split()
+        if not words:
+            return []
+        space_width = self.get_text_dimensions(' ')[0]
+        lines = []
+        current = []
+        current_width = 0
+        for word in words:
+            word_width = self.get_text_dimensions(word)[0]
+            if current and current_width + space_width + word_width > max_width:
+                lines.append(' '.join(current))
+                current = []
+                current_width = 0
+            if current:
+                current_width += space_width
+            current.append(word)
+            current_width += word_width
+        lines.append(' '.join(current))
+        return lines
+
 
 class PageProcessor:
     def __init__(self, text_processor):
@@ -496,7 +379,7 @@ class PageProcessor:
 
     def calculate_text_dimensions(self, text: str, font_size: float) -> tuple:
         """حساب أبعاد النص"""
-        return len(text) * font_size * 0.6, font_size * 1.2
+        return string_width(shape_arabic_text(text), 'Arabic', font_size), font_size * 1.2
 
     def find_optimal_position(self, bbox, text_width, text_height, used_positions, 
                             page_width, page_height):
@@ -629,6 +512,7 @@ class PDFHandler:
     def create_progress_bar(self, total_pages: int):
         """إنشاء شريط تقدم العملية"""
         try:
+            from tqdm import tqdm
             return tqdm(
                 total=total_pages,
                 desc="تقدم الترجمة",
@@ -677,30 +561,92 @@ class PDFTranslatorConfig:
         self.TEMP_DIR = base_dir / "temp"
         self.LOG_DIR = base_dir / "logs"
         self.FONTS_DIR = base_dir / "fonts"
+        self.CACHE_DIR = base_dir / "cache"
+
+        # نتيجة البحث عن الخط العربي (تشاركها العمليات العاملة)
+        self.FONT_REGISTRY_PATH = self.CACHE_DIR / "font_registry.json"
+
+        # ذاكرة الترجمة الدائمة
+        self.TRANSLATION_MEMORY_PATH = self.CACHE_DIR / "translation_memory.sqlite3"
+        self.TRANSLATION_MEMORY_MAX_ENTRIES = 200000
+
+        # التوازي وتحديد معدل الطلبات
+        self.MAX_IN_FLIGHT_REQUESTS = 4
+        self.REQUESTS_PER_SECOND = 2.0
+        self.RATE_LIMIT_BURST = 4
+
+        # محرك الترجمة: google أو dictionary أو argos أو fake
+        self.TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', 'google')
+        self.TRANSLATION_BACKEND_OPTIONS = {
+            'dictionary_path': os.getenv('TRANSLATION_DICTIONARY')
+        }
+
+        # عدد العمليات لمعالجة الصفحات بالتوازي (1 = بالتتابع)
+        self.PARALLEL_WORKERS = int(os.getenv('PDF_WORKERS', '1'))
+
+        # خط المعالجة المتداخل (استخراج ← ترجمة ← رسم ← دمج)
+        self.PIPELINE_ENABLED = os.getenv('PDF_PIPELINE', '1') == '1'
+        self.PIPELINE_QUEUE_DEPTH = 4
+        self.PIPELINE_TRANSLATION_THREADS = 2
+
+        # سجل الصفحات المكتملة لاستئناف المهام المتوقفة
+        self.JOURNAL_DIR = self.CACHE_DIR / "journal"
+
+        # ترجمة النصوص المتكررة في المستند مرة واحدة
+        self.DEDUP_ENABLED = os.getenv('PDF_DEDUP', '1') == '1'
+
+        # وضع الذاكرة المحدودة للملفات الكبيرة جداً: تفريغ الصفحات بعد استخدامها
+        # وكتابة الناتج في مقاطع على القرص
+        self.LOW_MEMORY_MODE = os.getenv('PDF_LOW_MEMORY', '0') == '1'
+        self.SEGMENT_PAGES = int(os.getenv('PDF_SEGMENT_PAGES', '50'))
+
+        # التعرف الضوئي على الصفحات الممسوحة (صور دون نص)
+        self.OCR_ENABLED = os.getenv('PDF_OCR', '1') == '1'
+        self.OCR_DPI = int(os.getenv('PDF_OCR_DPI', '300'))
+        self.OCR_LANG = os.getenv('PDF_OCR_LANG', 'eng')
+        self.OCR_MIN_CONFIDENCE = 40
+
+        # إعادة استخدام نتائج الصفحات غير المتغيرة بين إصدارات الملف
+        self.INCREMENTAL_ENABLED = os.getenv('PDF_INCREMENTAL', '1') == '1'
+        self.PAGE_STORE_DIR = self.CACHE_DIR / "pages"
+
+        # رسم طبقات كل الصفحات في مستند واحد: الخط والموارد تكتب مرة واحدة ويحلل المستند مرة واحدة
+        # (السجل ومخزن الصفحات يحفظان الكتل وحدها، والصفحات المستأنفة يعاد رسمها من كتلها)
+        self.SINGLE_OVERLAY_ENABLED = os.getenv('PDF_SINGLE_OVERLAY', '1') == '1'
+
+        # عدد الملفات المترجمة في الوقت نفسه في وضع الدفعات
+        self.BATCH_JOBS = int(os.getenv('PDF_BATCH_JOBS', '2'))
+
+        # ملف المقاييس (.prom لمجمع textfile في node-exporter أو .json) وفترة تحديثه
+        self.METRICS_PATH = os.getenv('PDF_METRICS_PATH')
+        self.METRICS_INTERVAL = float(os.getenv('PDF_METRICS_INTERVAL', '15'))
+
+        # التسجيل: مستوى التفصيل (-1 إلى 2)، الكتابة عبر طابور، ونسبة عينة السجلات التفصيلية
+        self.LOG_VERBOSITY = int(os.getenv('PDF_LOG_VERBOSITY', '0'))
+        self.LOG_QUEUE = os.getenv('PDF_LOG_QUEUE', '1') != '0'
+        self.LOG_DEBUG_SAMPLE = int(os.getenv('PDF_LOG_DEBUG_SAMPLE', '100'))
 
         # إنشاء المجلدات المطلوبة
         for dir_path in [self.INPUT_DIR, self.OUTPUT_DIR, self.TEMP_DIR, 
-                        self.LOG_DIR, self.FONTS_DIR]:
+                        self.LOG_DIR, self.FONTS_DIR, self.CACHE_DIR]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
     def setup_logging(self):
         """إعداد نظام التسجيل"""
-        log_file = self.LOG_DIR / f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(str(log_file), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
+        return setup_logging(
+            self.LOG_DIR, self.LOG_VERBOSITY,
+            use_queue=self.LOG_QUEUE, debug_sample=self.LOG_DEBUG_SAMPLE
         )
 
 class PDFTranslator:
     def __init__(self):
         """تهيئة المترجم"""
+        from googletrans import Translator
         self.config = PDFTranslatorConfig()
         self.translator = Translator()
+        self.rate_limiter = TokenBucket(self.config.REQUESTS_PER_SECOND, self.config.RATE_LIMIT_BURST)
         self.setup_tesseract()
+        self.font_name = 'Arabic'
         self.initialize_fonts()
         self.temp_dir = tempfile.mkdtemp()
         self.processed_blocks = set()  # لتتبع الكتل المعالجة
@@ -709,6 +655,7 @@ class PDFTranslator:
     def setup_tesseract(self):
         """إعداد Tesseract OCR"""
         if os.name == 'nt':  # Windows
+            import pytesseract
             pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         else:  # Linux/Mac
             if not shutil.which('tesseract'):
@@ -719,42 +666,7 @@ class PDFTranslator:
     
     def initialize_fonts(self):
         """تهيئة الخطوط العربية"""
-        try:
-            font_paths = [
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
-                "./fonts/Amiri-Regular.ttf",
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-                "./fonts/FreeSans.ttf",
-                os.path.expanduser("~/.fonts/Amiri-Regular.ttf"),
-                os.path.expanduser("~/.local/share/fonts/Amiri-Regular.ttf")
-            ]
-
-            loaded_fonts = []
-
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                            logging.info(f"تم تحميل الخط: {font_path}")
-                            loaded_fonts.append(font_path)
-                            return True
-                    except Exception as e:
-                        logging.warning(f"فشل تحميل الخط {font_path}: {str(e)}")
-                        continue
-
-            if not loaded_fonts:
-                logging.warning("لم يتم العثور على أي خط عربي. جاري محاولة تنزيل خط Amiri...")
-                if self.download_amiri_font():
-                    return self.initialize_fonts()  # إعادة المحاولة بعد التنزيل
-
-            return bool(loaded_fonts)
-
-        except Exception as e:
-            logging.error(f"خطأ في تهيئة الخطوط: {str(e)}")
-            return False
+        return ensure_arabic_font(self.font_name)
 
     def cleanup(self):
         """تنظيف الملفات المؤقتة"""
@@ -766,10 +678,8 @@ class PDFTranslator:
     def prepare_arabic_text(self, text: str) -> str:
         """تحضير النص العربي للعرض بشكل صحيح"""
         try:
-            # إعادة تشكيل النص العربي
-            reshaped_text = arabic_reshaper.reshape(text)
-            # تطبيق خوارزمية BIDI للاتجاه الصحيح
-            bidi_text = get_display(reshaped_text)
+            # إعادة تشكيل النص العربي وتطبيق خوارزمية BIDI للاتجاه الصحيح
+            bidi_text = shape_arabic_text(text)
             # تحسين تنسيق النص
             bidi_text = self.improve_arabic_text(bidi_text)
             return bidi_text
@@ -796,6 +706,8 @@ class PDFTranslator:
 
         for attempt in range(max_attempts):
             try:
+                # انتظار محدد المعدل المشترك
+                self.rate_limiter.acquire_sync()
                 # ترجمة النص
                 translated = self.translator.translate(text, src='en', dest='ar').text
                 # تحسين النص المترجم
@@ -803,13 +715,11 @@ class PDFTranslator:
                 
                 if translated and translated.lower() != text.lower():
                     return translated
-                
-                time.sleep(0.5)  # تأخير لتجنب التقييد
             except Exception as e:
-                if attempt == max_attempts - 1:
+                if attempt == max_attempts - 1 or not is_retryable_error(e):
                     logging.error(f"فشلت الترجمة: {str(e)}")
                     return ""
-                time.sleep(1)  # انتظار قبل إعادة المحاولة
+                time.sleep(backoff_delay(attempt))  # تأخير أسي قبل إعادة المحاولة
         return ""
 
     def process_text_batch(self, texts: List[str]) -> List[str]:
@@ -826,9 +736,6 @@ class PDFTranslator:
                 # ترجمة النص
                 translated = self.translate_text_with_retry(cleaned_text)
                 translated_texts.append(translated)
-                
-                # تأخير صغير بين الترجمات
-                time.sleep(0.2)
             except Exception as e:
                 logging.error(f"خطأ في ترجمة النص: {str(e)}")
                 translated_texts.append("")
@@ -848,29 +755,7 @@ class PDFTranslator:
 
     def split_text_into_chunks(self, text: str, max_length: int = 1000) -> List[str]:
         """تقسيم النص الطويل إلى أجزاء أصغر"""
-        if len(text) <= max_length:
-            return [text]
-            
-        chunks = []
-        while text:
-            # محاولة تقسيم النص عند نقطة مناسبة
-            if len(text) <= max_length:
-                chunks.append(text)
-                break
-                
-            # البحث عن نقطة نهاية الجملة
-            split_point = text.rfind('.', 0, max_length)
-            if split_point == -1:
-                # إذا لم يتم العثور على نقطة، البحث عن مسافة
-                split_point = text.rfind(' ', 0, max_length)
-            if split_point == -1:
-                # إذا لم يتم العثور على مسافة، التقسيم عند الحد الأقصى
-                split_point = max_length
-                
-            chunks.append(text[:split_point].strip())
-            text = text[split_point:].strip()
-            
-        return chunks
+        return split_text_into_chunks(text, max_length)
 
     def is_chess_notation(self, text: str) -> bool:
         """التحقق مما إذا كان النص تدوين شطرنج"""
@@ -886,14 +771,14 @@ class PDFTranslator:
 
     class TextProcessor:
         def __init__(self):
+            from googletrans import Translator
             self.translator = Translator()
             self.batch_size = 10
 
     def prepare_arabic_text(self, text: str) -> str:
         """تحضير النص العربي للعرض"""
         try:
-            reshaped_text = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped_text)
+            bidi_text = shape_arabic_text(text)
             return self.improve_arabic_text(bidi_text)
         except Exception as e:
             logging.error(f"خطأ في تحضير النص العربي: {e}")
@@ -917,16 +802,16 @@ class PDFTranslator:
 
         for attempt in range(max_attempts):
             try:
+                self.rate_limiter.acquire_sync()
                 translated = self.translator.translate(text, src='en', dest='ar').text
                 translated = self.prepare_arabic_text(translated)
                 if translated and translated.lower() != text.lower():
                     return translated
-                time.sleep(0.5)
             except Exception as e:
-                if attempt == max_attempts - 1:
+                if attempt == max_attempts - 1 or not is_retryable_error(e):
                     logging.error(f"فشلت الترجمة: {str(e)}")
                     return ""
-                time.sleep(1)
+                time.sleep(backoff_delay(attempt))
         return ""
 
     def process_text_batch(self, texts: List[str]) -> List[str]:
@@ -939,12 +824,11 @@ class PDFTranslator:
                     continue
                     
                 print(f"جاري ترجمة: {text}")
-                translator = Translator()
-                translated = translator.translate(text, src='en', dest='ar').text
+                self.rate_limiter.acquire_sync()  # محدد المعدل بدلاً من التأخير الثابت
+                translated = self.translator.translate(text, src='en', dest='ar').text
                 print(f"الترجمة: {translated}")
                 
                 translated_texts.append(translated)
-                time.sleep(0.5)  # تأخير لتجنب التقييد
             except Exception as e:
                 logging.error(f"خطأ في ترجمة النص: {str(e)}")
                 translated_texts.append("")
@@ -1034,7 +918,7 @@ class PDFTranslator:
         packet = BytesIO()
         width, height = float(page_size[0]), float(page_size[1])
         c = canvas.Canvas(packet, pagesize=(width, height))
-        used_positions = []
+        used_positions = GridIndex()
 
         print(f"عدد الكتل المترجمة: {len(translated_blocks)}")
         
@@ -1069,7 +953,7 @@ class PDFTranslator:
                 
                 # إضافة خط توضيحي
                 self.draw_connection_line(c, x, y, bbox, text_width, text_height, height)
-                used_positions.append((x, y, text_width, text_height))
+                used_positions.insert((x, y, text_width, text_height))
 
             except Exception as e:
                 logging.error(f"خطأ في إضافة النص المترجم: {str(e)}")
@@ -1082,25 +966,10 @@ class PDFTranslator:
     def find_optimal_position(self, bbox, text_width, text_height, used_positions, 
                             page_width, page_height):
         """إيجاد أفضل موقع للنص المترجم"""
-        x = bbox[0]  # البدء من نفس الموقع الأفقي للنص الأصلي
-        y = page_height - bbox[3] - text_height - 5  # وضع النص فوق النص الأصلي
-        
-        # تجنب الخروج عن حدود الصفحة
-        x = max(5, min(x, page_width - text_width - 5))
-        y = max(5, min(y, page_height - text_height - 5))
-        
-        # تجنب التداخل مع النصوص الأخرى
-        while self.check_overlap((x, y, text_width, text_height), used_positions):
-            y -= text_height + 5
-            if y < 5:  # إذا وصلنا إلى أسفل الصفحة
-                y = page_height - text_height - 5
-                x += text_width + 10
-                if x + text_width > page_width - 5:
-                    x = 5
-                    y = page_height - text_height - 5
-                    break
-
-        return x, y
+        # البحث في الفهرس الشبكي بدلاً من فحص جميع المواقع السابقة
+        return find_free_position(
+            used_positions, bbox, text_width, text_height, page_width, page_height
+        )
 
     def draw_text_background(self, canvas_obj, x, y, width, height):
         """رسم خلفية شفافة للنص"""
@@ -1136,10 +1005,11 @@ class PDFTranslator:
             # إنشاء مجلد الإخراج إذا لم يكن موجوداً
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            # فتح الملف الأصلي
-            reader = PdfReader(input_path)
+            # فتح الملف الأصلي مرة واحدة لجميع الصفحات
+            document = DocumentSession(input_path).open()
+            reader = document.reader
             writer = PdfWriter()
-            total_pages = len(reader.pages)
+            total_pages = document.page_count
 
             print(f"عدد الصفحات: {total_pages}")
             
@@ -1150,9 +1020,7 @@ class PDFTranslator:
                     page = reader.pages[page_num]
                     
                     # استخراج النصوص
-                    with pdfplumber.open(input_path) as pdf:
-                        pdf_page = pdf.pages[page_num]
-                        text_blocks = pdf_page.extract_words()
+                    text_blocks = document.plumber_page(page_num).extract_words()
                         
                     # ترجمة النصوص المستخرجة
                     translated_blocks = self.translate_blocks(text_blocks)
@@ -1174,6 +1042,7 @@ class PDFTranslator:
             # حفظ الملف المترجم
             with open(output_path, 'wb') as output_file:
                 writer.write(output_file)
+            document.close()
 
             print(f"\nتمت الترجمة بنجاح!")
             print(f"يمكنك العثور على الملف المترجم في: {output_path}")
@@ -1308,98 +1177,137 @@ class PDFTranslator:
 from typing import List, Dict
 from io import BytesIO
 from reportlab.pdfgen import canvas
-from PIL import ImageFont
 import time
 
 class PageProcessor:
     def __init__(self, text_processor):
         self.text_processor = text_processor
-        self.batch_size = 10
+        self.batch_size = getattr(text_processor, 'batch_size', 10)
         self.processed_blocks = set()
+        self.overlay_document = None  # مستند الطبقات المشترك للملف الحالي (إن وجد)
 
-    def process_page(self, page_content, page_num: int):
-        """معالجة صفحة كاملة"""
+    def process_page(self, page_content, page_num: int) -> Tuple[List[Dict], bool]:
+        """معالجة صفحة كاملة وإرجاع (الكتل المترجمة، فشل)"""
+        with PAGE_SECONDS.time():
+            return run_coroutine(self.process_page_async(page_content, page_num))
+
+    async def process_page_async(self, page_content, page_num: int) -> Tuple[List[Dict], bool]:
+        """معالجة صفحة كاملة مع انتظار جميع دفعاتها معاً
+
+        تعيد (الكتل المترجمة، فشل)، حيث فشل تعني أن ترجمة كتلة واحدة على الأقل
+        لم تكتمل فلا تعامل نتيجة الصفحة كنتيجة نهائية.
+        """
         logging.info(f"معالجة الصفحة {page_num + 1}")
         translated_blocks = []
-        text_batch = []
-        blocks_to_process = []
+        failed = False
         
         if not page_content:
             logging.warning(f"لا يوجد محتوى في الصفحة {page_num + 1}")
-            return []
+            return [], False
             
         try:
-            # ترتيب المحتوى من أعلى إلى أسفل ومن اليمين إلى اليسار
-            sorted_content = sorted(
-                page_content,
-                key=lambda x: (-float(x.get('bbox', (0,0,0,0))[1]), -float(x.get('bbox', (0,0,0,0))[0]))
+            batches = self.collect_page_batches(page_content)
+            
+            results = await asyncio.gather(
+                *(self.text_processor.process_text_batch_async(texts) for texts, _ in batches),
+                return_exceptions=True
             )
+            
+            for (texts, blocks), translations in zip(batches, results):
+                if isinstance(translations, Exception):
+                    logging.error(f"خطأ في معالجة دفعة الترجمة: {str(translations)}")
+                    failed = True
+                    continue
+                if any(translation is None for translation in translations):
+                    failed = True
+                self.add_translations(translations, blocks, translated_blocks, page_num)
 
-            for block in sorted_content:
-                try:
-                    text = self.text_processor.clean_text(block.get('text', ''))
-                    if len(text.strip()) < 3 or self.text_processor.is_chess_notation(text):
-                        continue
-
-                    if 'bbox' not in block:
-                        continue
+            if failed:
+                logging.warning(f"لم تكتمل ترجمة الصفحة {page_num + 1}")
+            return translated_blocks, failed
+                
+        except Exception as e:
+            logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
+            return [], True
 
-                    text_batch.append(text)
-                    blocks_to_process.append(block)
+    def collect_page_batches(self, page_content) -> List[Tuple[List[str], List[Dict]]]:
+        """تجميع نصوص الصفحة القابلة للترجمة في دفعات"""
+        batches = []
+        text_batch = []
+        blocks_to_process = []
 
-                    if len(text_batch) >= self.batch_size:
-                        self.process_and_add_translations(
-                            text_batch, blocks_to_process, translated_blocks, page_num
-                        )
-                        text_batch = []
-                        blocks_to_process = []
+        # ترتيب المحتوى من أعلى إلى أسفل ومن اليمين إلى اليسار
+        sorted_content = sorted(
+            page_content,
+            key=lambda x: (-float(x.get('bbox', (0,0,0,0))[1]), -float(x.get('bbox', (0,0,0,0))[0]))
+        )
 
-                except Exception as e:
-                    logging.error(f"خطأ في معالجة كتلة النص: {str(e)}")
+        for block in sorted_content:
+            try:
+                text = self.prepare_block_text(block)
+                if not text:
+                    BLOCKS_SKIPPED_METRIC.inc()
                     continue
 
-            # معالجة الكتل المتبقية
-            if text_batch:
-                self.process_and_add_translations(
-                    text_batch, blocks_to_process, translated_blocks, page_num
-                )
+                text_batch.append(text)
+                blocks_to_process.append(block)
 
-            return translated_blocks
-                
-        except Exception as e:
-            logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
-            return []
+                if len(text_batch) >= self.batch_size:
+                    batches.append((text_batch, blocks_to_process))
+                    text_batch = []
+                    blocks_to_process = []
+
+            except Exception as e:
+                logging.error(f"خطأ في معالجة كتلة النص: {str(e)}")
+                continue
+
+        # الكتل المتبقية
+        if text_batch:
+            batches.append((text_batch, blocks_to_process))
+
+        return batches
+
+    def prepare_block_text(self, block: Dict):
+        """تنظيف نص الكتلة وإرجاعه إذا كان قابلاً للترجمة"""
+        if 'bbox' not in block:
+            return None
+        text = self.text_processor.clean_text(block.get('text', ''))
+        if len(text.strip()) < 3 or self.text_processor.is_chess_notation(text):
+            return None
+        return text
    
     def process_and_add_translations(self, texts: List[str], blocks: List[Dict], translated_blocks: List[Dict], page_num: int):
         """معالجة وإضافة الترجمات"""
         try:
-            print(f"معالجة {len(texts)} نص للترجمة")
             translations = self.text_processor.process_text_batch(texts)
-            
-            for trans, block in zip(translations, blocks):
-                try:
-                    if trans and trans.strip():
-                        # إضافة معلومات الترجمة
-                        translated_block = {
-                            'text': trans,
-                            'bbox': block['bbox'],
-                            'original_bbox': block['bbox'],
-                            'type': 'text',
-                            'page': page_num,
-                            'original': block.get('text', '')
-                        }
-                        
-                        translated_blocks.append(translated_block)
-                        print(f"تمت إضافة الترجمة: {trans}")
-                        
-                except Exception as e:
-                    print(f"خطأ في إضافة الترجمة للكتلة: {str(e)}")
-                    logging.error(f"خطأ في إضافة الترجمة للكتلة: {str(e)}")
-                    continue
+            self.add_translations(translations, blocks, translated_blocks, page_num)
                     
         except Exception as e:
-            print(f"خطأ في معالجة دفعة الترجمة: {str(e)}")
             logging.error(f"خطأ في معالجة دفعة الترجمة: {str(e)}")
+
+    def add_translations(self, translations: List[str], blocks: List[Dict], translated_blocks: List[Dict], page_num: int):
+        """إضافة الترجمات إلى قائمة الكتل المترجمة"""
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        for trans, block in zip(translations, blocks):
+            try:
+                if trans and trans.strip():
+                    # إضافة معلومات الترجمة
+                    translated_block = {
+                        'text': trans,
+                        'bbox': block['bbox'],
+                        'original_bbox': block['bbox'],
+                        'type': 'text',
+                        'page': page_num,
+                        'original': block.get('text', '')
+                    }
+                    
+                    translated_blocks.append(translated_block)
+                    if debug:
+                        logging.debug(f"تمت إضافة الترجمة: {trans}")
+                    
+            except Exception as e:
+                logging.error(f"خطأ في إضافة الترجمة للكتلة: {str(e)}")
+                continue
     
     
     def calculate_font_size(self, text: str, bbox: tuple) -> float:
@@ -1444,24 +1352,24 @@ class PageProcessor:
             print(f"خطأ في رسم خلفية النص: {str(e)}")
             logging.error(f"خطأ في رسم خلفية النص: {str(e)}")
 
-def draw_connection_line(self, canvas_obj, x, y, bbox, text_width, text_height, page_height):
-    """رسم خط يربط النص المترجم بالنص الأصلي"""
-    try:
-        # تعيين لون وسمك الخط
-        canvas_obj.setStrokeColorRGB(0.7, 0.7, 0.7, 0.5)
-        canvas_obj.setLineWidth(0.3)
-        
-        # حساب نقاط البداية والنهاية
-        start_x = x + text_width / 2
-        start_y = y + text_height / 2
-        end_x = (bbox[0] + bbox[2]) / 2
-        end_y = page_height - ((bbox[1] + bbox[3]) / 2)
-        
-        # رسم الخط
-        canvas_obj.line(start_x, start_y, end_x, end_y)
-    except Exception as e:
-        print(f"خطأ في رسم خط الربط: {str(e)}")
-        logging.error(f"خطأ في رسم خط الربط: {str(e)}")
+    def draw_connection_line(self, canvas_obj, x, y, bbox, text_width, text_height, page_height):
+        """رسم خط يربط النص المترجم بالنص الأصلي"""
+        try:
+            # تعيين لون وسمك الخط
+            canvas_obj.setStrokeColorRGB(0.7, 0.7, 0.7, 0.5)
+            canvas_obj.setLineWidth(0.3)
+
+            # حساب نقاط البداية والنهاية
+            start_x = x + text_width / 2
+            start_y = y + text_height / 2
+            end_x = (bbox[0] + bbox[2]) / 2
+            end_y = page_height - ((bbox[1] + bbox[3]) / 2)
+
+            # رسم الخط
+            canvas_obj.line(start_x, start_y, end_x, end_y)
+        except Exception as e:
+            print(f"خطأ في رسم خط الربط: {str(e)}")
+            logging.error(f"خطأ في رسم خط الربط: {str(e)}")
     
     
     def validate_block(self, block: dict) -> bool:
@@ -1527,107 +1435,122 @@ def draw_connection_line(self, canvas_obj, x, y, bbox, text_width, text_height,
             logging.debug(f"خطأ في التحقق من الكتلة: {str(e)}")
             return False
 
-    def process_and_add_translations(self, texts: List[str], blocks: List[Dict], 
-                                   translated_blocks: List[Dict], page_num: int):
-        """معالجة وإضافة الترجمات"""
-        translations = self.text_processor.process_text_batch(texts)
-        for trans, block in zip(translations, blocks):
-            if trans and trans.strip():
-                translated_blocks.append({
-                    'text': trans,
-                    'bbox': block['bbox'],
-                    'original_bbox': block['bbox'],
-                    'type': 'text',
-                    'page': page_num,
-                    'original': block.get('text', '')
-                })
-
     def create_translated_overlay(self, translated_blocks, page_num, page_size):
-        """إنشاء طبقة الترجمة"""
+        """إنشاء طبقة الترجمة
+
+        عند تفعيل مستند الطبقات المشترك ترسم الصفحة فيه ولا تعاد طبقة منفصلة.
+        """
+        with OVERLAY_SECONDS.time():
+            if self.overlay_document is not None:
+                width, height = float(page_size[0]), float(page_size[1])
+                try:
+                    self.overlay_document.draw(
+                        page_num, (width, height),
+                        lambda c: self.draw_blocks(c, translated_blocks, page_num, width, height)
+                    )
+                except Exception as e:
+                    logging.error(f"خطأ في إنشاء طبقة الترجمة: {str(e)}")
+                return None
+            return self.render_overlay(translated_blocks, page_num, page_size)
+
+    def render_overlay(self, translated_blocks, page_num, page_size):
+        """رسم كتل الصفحة المترجمة في طبقة PDF مستقلة"""
         try:
             packet = BytesIO()
             width, height = float(page_size[0]), float(page_size[1])
             c = canvas.Canvas(packet, pagesize=(width, height))
-            used_positions = []
-            
-            # إنشاء كائن ArabicWriter
-            arabic_writer = ArabicWriter()
+            self.draw_blocks(c, translated_blocks, page_num, width, height)
+            c.save()
+            packet.seek(0)
+            return packet
 
-            print(f"إنشاء طبقة الترجمة للصفحة {page_num + 1}")
-            print(f"عدد الكتل المترجمة: {len(translated_blocks)}")
+        except Exception as e:
+            logging.error(f"خطأ في إنشاء طبقة الترجمة: {str(e)}")
+            return self.create_empty_page(float(page_size[0]), float(page_size[1]))
 
-            for block in translated_blocks:
-                try:
-                    if block['type'] != 'text':
-                        continue
+    def draw_blocks(self, c, translated_blocks, page_num, width: float, height: float):
+        """رسم كتل الصفحة المترجمة على الصفحة الحالية في لوحة الرسم"""
+        used_positions = GridIndex()
+        
+        # إنشاء كائن ArabicWriter
+        arabic_writer = ArabicWriter()
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
 
-                    text = block['text']
-                    if not text:
-                        continue
+        if debug:
+            logging.debug(f"إنشاء طبقة الترجمة للصفحة {page_num + 1} ({len(translated_blocks)} كتلة)")
 
-                    # حساب أبعاد النص
-                    text_width, text_height = arabic_writer.get_text_dimensions(text)
-                    
-                    # تحديد الموقع
-                    bbox = block['original_bbox']
-                    x, y = self.find_optimal_position(
-                        bbox, text_width, text_height, used_positions, width, height
-                    )
+        for block in translated_blocks:
+            try:
+                if block['type'] != 'text':
+                    continue
 
-                    # رسم خلفية بيضاء شفافة
-                    self.draw_text_background(c, x, y, text_width, text_height)
+                text = block['text']
+                if not text:
+                    continue
 
-                    # كتابة النص العربي
-                    actual_width, actual_height = arabic_writer.write_arabic_text(
-                        c, text, x, y + text_height, align='right'
-                    )
+                # تقسيم الفقرات الطويلة إلى أسطر بعرض الكتلة الأصلية
+                bbox = block['original_bbox']
+                lines = arabic_writer.wrap_text(text, max(bbox[2] - bbox[0], width / 3))
+                line_height = arabic_writer.get_text_dimensions(text)[1]
+                text_width = max(arabic_writer.get_text_dimensions(line)[0] for line in lines)
+                text_height = line_height * len(lines)
+                
+                # تحديد الموقع
+                x, y = self.find_optimal_position(
+                    bbox, text_width, text_height, used_positions, width, height
+                )
 
-                    # رسم خط توضيحي
-                    self.draw_connection_line(c, x, y, bbox, actual_width, actual_height, height)
-                    
-                    # تحديث المواقع المستخدمة
-                    used_positions.append((x, y, actual_width, actual_height))
-                    print(f"تمت إضافة النص: {text}")
+                # رسم خلفية بيضاء شفافة
+                self.draw_text_background(c, x, y, text_width, text_height)
 
-                except Exception as e:
-                    print(f"خطأ في معالجة كتلة نص: {str(e)}")
-                    continue
+                # كتابة النص العربي سطراً سطراً
+                for i, line in enumerate(lines):
+                    arabic_writer.write_arabic_text(
+                        c, line, x, y + text_height - i * line_height,
+                        width=text_width, align='right'
+                    )
 
-            c.save()
-            packet.seek(0)
-            return packet
+                # رسم خط توضيحي
+                self.draw_connection_line(c, x, y, bbox, text_width, text_height, height)
+                
+                # تحديث المواقع المستخدمة
+                used_positions.insert((x, y, text_width, text_height))
+                OVERLAY_BLOCKS_METRIC.inc()
+                if debug:
+                    logging.debug(f"تمت إضافة النص: {text}")
 
-        except Exception as e:
-            print(f"خطأ في إنشاء طبقة الترجمة: {str(e)}")
-            return self.create_empty_page(width, height)
+            except Exception as e:
+                logging.warning(f"خطأ في معالجة كتلة نص: {str(e)}")
+                continue
+
+    def create_empty_page(self, width: float, height: float) -> BytesIO:
+        """إنشاء طبقة فارغة في حالة الخطأ"""
+        packet = BytesIO()
+        c = canvas.Canvas(packet, pagesize=(width, height))
+        c.save()
+        packet.seek(0)
+        return packet
     
     def calculate_text_dimensions(self, text: str, font_size: float) -> tuple:
         """حساب أبعاد النص"""
-        return len(text) * font_size * 0.6, font_size * 1.2
+        return string_width(shape_arabic_text(text), 'Arabic', font_size), font_size * 1.2
 
     def find_optimal_position(self, bbox, text_width, text_height, used_positions, 
                             page_width, page_height):
         """إيجاد أفضل موقع للنص المترجم"""
-        x = bbox[0]
-        y = page_height - bbox[3] - text_height - 5
-        
-        x = max(5, min(x, page_width - text_width - 5))
-        y = max(5, min(y, page_height - text_height - 5))
-        
-        while self.check_overlap((x, y, text_width, text_height), used_positions):
-            y -= text_height + 5
-            if y < 5:
-                y = page_height - text_height - 5
-                x += text_width + 10
-                if x + text_width > page_width - 5:
-                    x = 5
-                    y = page_height - text_height - 5
-                    break
-
-        return x, y
+        if not isinstance(used_positions, GridIndex):
+            index = GridIndex()
+            for rect in used_positions:
+                index.insert(rect)
+            used_positions = index
+        return find_free_position(
+            used_positions, bbox, text_width, text_height, page_width, page_height
+        )
 
     def check_overlap(self, current_rect, used_positions):
         """التحقق من تداخل النصوص"""
+        if isinstance(used_positions, GridIndex):
+            return bool(used_positions.find_overlaps(current_rect))
         x, y, w, h = current_rect
         for used_x, used_y, used_w, used_h in used_positions:
             if (x < used_x + used_w and x + w > used_x and
@@ -1642,75 +1565,352 @@ class PDFHandler:
         self.page_processor = page_processor
         self.temp_dir = tempfile.mkdtemp()
         self.current_pdf_path = None
+        self.run_stats = {}  # إحصائيات آخر عملية ترجمة (تحفظ في البيانات الوصفية)
+        self.layout_analyzer = LayoutAnalyzer()
+        self.ocr_ready = None  # هل Tesseract متوفر (يفحص مرة واحدة عند أول صفحة ممسوحة)
+        self.extracted_pages = {}  # كتل استخرجت في المرور المسبق ولم تعالج بعد
 
-    def translate_pdf(self, input_path: str):
-        """ترجمة ملف PDF"""
+    def translate_pdf(self, input_path: str, resume: bool = False, output_path: Optional[str] = None):
+        """ترجمة ملف PDF (إلى مجلد الإخراج باسم الملف ما لم يحدد مسار الإخراج)"""
         input_path = Path(input_path)
         self.current_pdf_path = str(input_path)
-        output_path = Path(self.config.OUTPUT_DIR) / f"translated_{input_path.stem}.pdf"
+        self.run_stats = {}
+        self.extracted_pages = {}
+        if output_path is None:
+            output_path = Path(self.config.OUTPUT_DIR) / f"translated_{input_path.stem}.pdf"
+        output_path = Path(output_path)
+        low_memory = getattr(self.config, 'LOW_MEMORY_MODE', False)
+        started = time.perf_counter()
+        document = DocumentSession(input_path, release_pages=low_memory)
         
         try:
-            if not self.validate_pdf(str(input_path)):
+            try:
+                # تحليل الملف مرة واحدة يغني عن التحقق المنفصل
+                document.open()
+            except Exception as e:
+                logging.error(f"ملف PDF غير صالح: {str(e)}")
                 raise ValueError("ملف PDF غير صالح")
 
             logging.info(f"بدء ترجمة: {input_path}")
             
-            with pdfplumber.open(str(input_path)) as plumber_pdf:
-                pdf_reader = PdfReader(str(input_path))
+            # سجل الصفحات المكتملة للاستئناف بعد الأعطال
+            journal = PageJournal(
+                self.config.JOURNAL_DIR, input_path, self.journal_settings(),
+                fingerprint=document.fingerprint
+            )
+            completed_pages = journal.open(resume=resume)
+            
+            if low_memory:
+                pdf_writer = SegmentedPdfWriter(
+                    Path(self.temp_dir) / "segments", self.config.SEGMENT_PAGES
+                )
+            else:
                 pdf_writer = PdfWriter()
-                total_pages = len(plumber_pdf.pages)
-                
-                progress_bar = self.create_progress_bar(total_pages)
-                
-                for page_num in range(total_pages):
-                    try:
-                        page = plumber_pdf.pages[page_num]
-                        text_content = self.extract_words_safely(page)
-                        
-                        if text_content:
-                            translated_blocks = self.page_processor.process_page(text_content, page_num)
-                            
-                            if translated_blocks:
-                                width, height = float(page.width), float(page.height)
-                                overlay_packet = self.page_processor.create_translated_overlay(
-                                    translated_blocks,
-                                    page_num,
-                                    (width, height)
-                                )
-                                
-                                overlay_pdf = PdfReader(overlay_packet)
-                                page_obj = pdf_reader.pages[page_num]
-                                page_obj.merge_page(overlay_pdf.pages[0])
-                                pdf_writer.add_page(page_obj)
-                            else:
-                                pdf_writer.add_page(pdf_reader.pages[page_num])
+            total_pages = document.page_count
+            
+            progress_bar = self.create_progress_bar(total_pages)
+            pending_pages = [p for p in range(total_pages) if p not in completed_pages]
+            workers = getattr(self.config, 'PARALLEL_WORKERS', 1)
+            parallel = workers > 1 and len(pending_pages) > 1
+            
+            # مستند طبقات مشترك يضمن الخط مرة واحدة لكل دفعة مدمجة: الملف كله، أو كل
+            # مقطع في وضع الذاكرة المحدودة، أو كل نطاق صفحات يرسمه عامل
+            overlay_document = None
+            if getattr(self.config, 'SINGLE_OVERLAY_ENABLED', False):
+                overlay_document = OverlayDocument()
+            self.page_processor.overlay_document = overlay_document
+            
+            page_store, page_keys, stored_pages = None, {}, set()
+            if getattr(self.config, 'INCREMENTAL_ENABLED', False) and pending_pages:
+                # الصفحات التي لم يتغير محتواها تنسخ نتيجتها من التشغيل السابق
+                page_store = PageResultStore(self.config.PAGE_STORE_DIR)
+                page_keys = self.compute_page_keys(document, pending_pages)
+                stored_pages = {p for p in pending_pages if p in page_keys and page_store.contains(page_keys[p])}
+                pending_pages = [p for p in pending_pages if p not in stored_pages]
+                self.run_stats['incremental'] = {
+                    'reused_pages': len(stored_pages),
+                    'translated_pages': len(pending_pages)
+                }
+                logging.info(
+                    f"الترجمة التزايدية: إعادة استخدام {len(stored_pages)} صفحة، "
+                    f"ومعالجة {len(pending_pages)} صفحة متغيرة"
+                )
+            
+            if getattr(self.config, 'DEDUP_ENABLED', False) and pending_pages:
+                if low_memory:
+                    # لا تحفظ كتل المستند كله: التكرار يزال تدريجياً عبر ذاكرة الترجمة أثناء المعالجة
+                    logging.info("إزالة التكرار عبر ذاكرة الترجمة أثناء معالجة الصفحات (وضع الذاكرة المحدودة)")
+                elif parallel:
+                    # المرور المسبق يستخرج كل الصفحات في هذه العملية وحدها، فيترك الاستخراج
+                    # للعمليات العاملة والتكرار يزال عبر ذاكرة الترجمة المشتركة بينها
+                    logging.info("إزالة التكرار عبر ذاكرة الترجمة المشتركة بين العمليات العاملة")
+                else:
+                    # ترجمة النصوص الفريدة في المستند مرة واحدة، وتبقى الكتل المستخرجة لمرحلة الرسم
+                    self.translate_unique_strings(document, pending_pages)
+            
+            if parallel:
+                # الاستخراج والرسم في مجمع عمليات، والتجميع هنا بترتيب الصفحات
+                overlays = render_pages_parallel(
+                    create_pdf_handler, self.config, str(input_path), pending_pages, workers,
+                    pretranslated=self.page_processor.text_processor.pretranslated,
+                    page_blocks=self.extracted_pages,
+                    overlay_document=overlay_document
+                )
+            elif getattr(self.config, 'PIPELINE_ENABLED', False):
+                # مراحل متداخلة: استخراج الصفحة التالية أثناء ترجمة الحالية
+                pipeline = PagePipeline(
+                    self,
+                    queue_depth=self.config.PIPELINE_QUEUE_DEPTH,
+                    translation_threads=self.config.PIPELINE_TRANSLATION_THREADS
+                )
+                overlays = pipeline.run(document, pending_pages)
+            else:
+                overlays = self.render_pages(document, pending_pages)
+            
+            deferred_pages = {}  # طبقات الصفحات المنتظرة لاكتمال مستند الطبقات
+            for page_num in range(total_pages):
+                try:
+                    if page_num in completed_pages:
+                        translated_blocks, overlay_packet = journal.load(page_num)
+                    elif page_num in stored_pages:
+                        translated_blocks, overlay_packet = page_store.get(page_keys[page_num]) or ([], None)
+                    else:
+                        _, translated_blocks, overlay_packet, failed = next(overlays)
+                        if failed:
+                            # الترجمة الناقصة ترسم في هذا التشغيل فقط ولا تحفظ كنتيجة نهائية
+                            self.run_stats.setdefault('failed_pages', []).append(page_num + 1)
                         else:
-                            pdf_writer.add_page(pdf_reader.pages[page_num])
-                            
-                        if progress_bar:
-                            progress_bar.update(1)
-                            
-                        if page_num % 5 == 0:
-                            self.optimize_memory_usage()
-                            
-                    except Exception as e:
-                        logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
-                        pdf_writer.add_page(pdf_reader.pages[page_num])
-                        continue
-
-                output_path.parent.mkdir(parents=True, exist_ok=True)
+                            journal.record(page_num, translated_blocks, overlay_packet)
+                            if page_store is not None and page_num in page_keys:
+                                page_store.put(page_keys[page_num], translated_blocks, overlay_packet)
+                    if translated_blocks and overlay_packet is None and (
+                            overlay_document is None or page_num not in overlay_document):
+                        # نتيجة محفوظة من مستند طبقات سابق: إعادة رسمها من كتلها. حفظ طبقة مستقلة
+                        # لكل صفحة يعيد نسخة الخط لكل صفحة مدمجة، وإعادة الرسم (تشكيل ورسم دون
+                        # ترجمة) أرخص من دمج تلك الطبقات وتبقي الخط مشتركاً
+                        mediabox = document.reader_page(page_num).mediabox
+                        overlay_packet = self.page_processor.create_translated_overlay(
+                            translated_blocks, page_num, (mediabox.width, mediabox.height)
+                        )
+                    if overlay_document is not None:
+                        deferred_pages[page_num] = overlay_packet
+                    else:
+                        self.add_page_with_overlay(pdf_writer, document.reader, page_num, overlay_packet)
+                except Exception as e:
+                    logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
+                    if overlay_document is not None:
+                        deferred_pages[page_num] = None
+                    else:
+                        pdf_writer.add_page(document.reader_page(page_num))
+                
+                if overlay_document is not None and (
+                        page_num == total_pages - 1
+                        or (low_memory and len(deferred_pages) >= pdf_writer.segment_pages)):
+                    self.merge_deferred_pages(pdf_writer, document, deferred_pages, overlay_document)
+                    
+                if progress_bar:
+                    progress_bar.update(1)
+                PAGES_METRIC.inc()
+                PAGES_PER_SECOND.set((page_num + 1) / max(time.perf_counter() - started, 1e-6))
+                    
+                if low_memory and pdf_writer.pending_pages == 0 and not deferred_pages:
+                    # الصفحات المدمجة أصبحت على القرص: تحرير نسخها من قارئ المستند
+                    document.reset_reader()
+                    self.optimize_memory_usage()
+                elif page_num % 5 == 0:
+                    self.optimize_memory_usage()
+
+            if overlay_document is not None:
+                self.run_stats['overlay'] = overlay_document.stats()
+
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            if low_memory:
+                pdf_writer.write(output_path)
+                self.run_stats['memory'] = pdf_writer.stats()
+            else:
                 with open(str(output_path), 'wb') as output_file:
                     pdf_writer.write(output_file)
-                
-                self.save_translation_metadata(input_path, output_path)
-                logging.info("اكتملت الترجمة بنجاح")
+                self.run_stats['memory'] = {'peak_rss_mb': peak_rss_mb()}
+            
+            if self.run_stats['memory']['peak_rss_mb'] is not None:
+                logging.info(f"أقصى استهلاك للذاكرة: {self.run_stats['memory']['peak_rss_mb']:.0f} MB")
+            
+            self.run_stats['shaping'] = shaping_stats()
+            logging.info(f"نسبة إصابة ذاكرة التشكيل: {self.run_stats['shaping']['hit_rate']:.1%}")
+            self.save_translation_metadata(input_path, output_path)
+            if self.run_stats.get('failed_pages'):
+                # السجل يبقى حتى يعيد الاستئناف ترجمة الصفحات الفاشلة فقط
+                logging.warning(
+                    f"لم تكتمل ترجمة {len(self.run_stats['failed_pages'])} صفحة، "
+                    f"ويمكن إعادة المحاولة بالاستئناف"
+                )
+            else:
+                journal.clear()
+            DOCUMENTS_METRIC.inc()
+            DOCUMENT_SECONDS.observe(time.perf_counter() - started)
+            logging.info("اكتملت الترجمة بنجاح")
                 
         except Exception as e:
+            DOCUMENTS_FAILED_METRIC.inc()
             logging.error(f"خطأ في عملية الترجمة: {str(e)}")
             raise
         finally:
+            self.page_processor.overlay_document = None
+            self.extracted_pages = {}
+            document.close()
             self.cleanup()
 
+    def translate_unique_strings(self, document, page_numbers: List[int]):
+        """المرور المسبق: جمع النصوص الفريدة في المستند وترجمتها مرة واحدة
+
+        كتل كل صفحة تحفظ في extracted_pages وتستهلكها مرحلة الرسم، فلا تستخرج
+        الصفحة مرتين.
+        """
+        deduplicator = DocumentDeduplicator(self.page_processor)
+        for page_num in page_numbers:
+            blocks = self.extract_page_blocks(document, page_num)
+            if blocks is None:
+                # صفحة ممسوحة: تقرأ ضوئياً في مرحلة المعالجة
+                continue
+            self.extracted_pages[page_num] = blocks
+            deduplicator.collect([blocks])
+        stats = deduplicator.stats()
+        logging.info(
+            f"إزالة التكرار: {stats['unique_strings']} نص فريد من {stats['total_strings']} "
+            f"(نسبة التكرار {stats['dedup_ratio']:.1%})"
+        )
+        deduplicator.translate_unique()
+        self.run_stats['dedup'] = stats
+
+    def compute_page_keys(self, document, page_numbers: List[int]) -> dict:
+        """بصمات محتوى الصفحات مع إعدادات المعالجة"""
+        hasher = PageHasher(self.journal_settings())
+        page_keys = {}
+        for page_num in page_numbers:
+            try:
+                page_keys[page_num] = hasher.hash_page(document.reader_page(page_num))
+            except Exception as e:
+                logging.warning(f"تعذر حساب بصمة الصفحة {page_num + 1}: {str(e)}")
+        return page_keys
+
+    def extract_page_blocks(self, document, page_num: int) -> Optional[list]:
+        """استخراج كتل صفحة من المستند دون تعرف ضوئي ثم تفريغ ذاكرتها في وضع الذاكرة المحدودة"""
+        blocks = self.extract_page_content(document.plumber_page(page_num), page_num, recognize=False)
+        document.release_page(page_num)
+        return blocks
+
+    def extract_page_content(self, page, page_num: int, recognize: bool = True) -> Optional[list]:
+        """كتل الصفحة: من المرور المسبق أو من طبقة النص أو من التعرف الضوئي
+
+        الصفحة التي لا تعطي كلمات وتحتوي صوراً تعامل كصفحة ممسوحة. مع
+        recognize=False تعاد None لها ليقرأها ضوئياً من يعالجها لاحقاً.
+        """
+        if page_num in self.extracted_pages:
+            return self.extracted_pages.pop(page_num)
+        blocks = self.extract_words_safely(page)
+        if not blocks and self.is_scanned_page(page):
+            return self.recognize_page(page_num) if recognize else None
+        return blocks
+
+    def is_scanned_page(self, page) -> bool:
+        """صفحة صور دون طبقة نص تحتاج إلى تعرف ضوئي"""
+        return getattr(self.config, 'OCR_ENABLED', False) and is_image_only_page(page)
+
+    def recognize_page(self, page_num: int) -> list:
+        """قراءة صفحة ممسوحة ضوئياً
+
+        ترفع OCRError إذا لم يكن Tesseract مثبتاً أو فشل التعرف، فتعد الصفحة
+        فاشلة ولا تحفظ كنتيجة نهائية في السجل أو مخزن الصفحات.
+        """
+        if self.ocr_ready is None:
+            self.ocr_ready = tesseract_available()
+            if not self.ocr_ready:
+                logging.warning("Tesseract غير مثبت، ستترك الصفحات الممسوحة دون ترجمة")
+        if not self.ocr_ready:
+            OCR_FAILED_METRIC.inc()
+            raise OCRError(f"الصفحة {page_num + 1} ممسوحة ضوئياً و Tesseract غير مثبت")
+        try:
+            blocks = ocr_page(
+                self.current_pdf_path, page_num,
+                dpi=self.config.OCR_DPI,
+                lang=self.config.OCR_LANG,
+                min_confidence=self.config.OCR_MIN_CONFIDENCE
+            )
+        except OCRError:
+            OCR_FAILED_METRIC.inc()
+            raise
+        OCR_PAGES_METRIC.inc()
+        return blocks
+
+    def journal_settings(self) -> dict:
+        """الإعدادات التي تجعل نتائج السجل صالحة للاستئناف"""
+        text_processor = self.page_processor.text_processor
+        return {
+            'backend': text_processor.backend_name,
+            'src': text_processor.src_lang,
+            'dest': text_processor.dest_lang,
+            'layout': 'paragraphs',
+            'shaping': 'render',
+            'ocr_dpi': self.config.OCR_DPI if getattr(self.config, 'OCR_ENABLED', False) else None
+        }
+
+    def render_pages(self, document, page_numbers: List[int]):
+        """معالجة الصفحات بالتتابع وإرجاع كتل وطبقة كل صفحة وهل فشلت ترجمتها"""
+        for page_num in page_numbers:
+            try:
+                translated_blocks, overlay_packet, failed = self.render_page(document.plumber_page(page_num), page_num)
+                document.release_page(page_num)
+            except Exception as e:
+                logging.error(f"خطأ في معالجة الصفحة {page_num + 1}: {str(e)}")
+                translated_blocks, overlay_packet, failed = [], None, True
+            yield page_num, translated_blocks, overlay_packet, failed
+
+    def render_page(self, page, page_num: int):
+        """استخراج نصوص صفحة وترجمتها ورسم طبقة الترجمة
+
+        تعيد (الكتل المترجمة، الطبقة، فشل)؛ الصفحة الفاشلة لا تحفظ كنتيجة نهائية.
+        """
+        text_content = self.extract_page_content(page, page_num)
+        if not text_content:
+            return [], None, False
+            
+        translated_blocks, failed = self.page_processor.process_page(text_content, page_num)
+        if not translated_blocks:
+            return [], None, failed
+            
+        width, height = float(page.width), float(page.height)
+        overlay_packet = self.page_processor.create_translated_overlay(
+            translated_blocks,
+            page_num,
+            (width, height)
+        )
+        return translated_blocks, overlay_packet, failed
+
+    def merge_deferred_pages(self, pdf_writer, document, deferred_pages: dict, overlay_document):
+        """تحليل طبقات الدفعة المؤجلة مرة واحدة ثم دمج كل صفحة بموقعها فيها"""
+        overlay_document.finish()
+        for page_num in sorted(deferred_pages):
+            try:
+                self.add_page_with_overlay(
+                    pdf_writer, document.reader, page_num,
+                    deferred_pages[page_num], overlay_document
+                )
+            except Exception as e:
+                logging.error(f"خطأ في دمج الصفحة {page_num + 1}: {str(e)}")
+                pdf_writer.add_page(document.reader_page(page_num))
+        deferred_pages.clear()
+
+    def add_page_with_overlay(self, pdf_writer, pdf_reader, page_num: int, overlay_packet,
+                              overlay_document=None):
+        """دمج طبقة الترجمة مع الصفحة الأصلية وإضافتها للملف الناتج"""
+        page_obj = pdf_reader.pages[page_num]
+        overlay_page = overlay_document.page(page_num) if overlay_document is not None else None
+        if overlay_page is None and overlay_packet is not None:
+            overlay_page = PdfReader(overlay_packet).pages[0]
+        if overlay_page is not None:
+            page_obj.merge_page(overlay_page)
+        pdf_writer.add_page(page_obj)
+
     def validate_pdf(self, file_path: str) -> bool:
         """التحقق من صلاحية ملف PDF"""
         try:
@@ -1722,49 +1922,20 @@ class PDFHandler:
             return False
 
     def extract_words_safely(self, page) -> list:
-        """استخراج الكلمات من الصفحة بشكل آمن"""
+        """استخراج فقرات الصفحة بحدودها الحقيقية"""
         try:
-            print("جاري استخراج النصوص من الصفحة...")
-            
-            # استخدام extract_text بدلاً من extract_words للحصول على النص كاملاً
-            text = page.extract_text()
-            if not text:
-                print("لم يتم العثور على نص في الصفحة")
-                return []
-                
-            print(f"النص المستخرج: {text}")
-            
-            # تقسيم النص إلى كلمات
-            words = []
-            lines = text.split('\n')
-            y_position = float(page.height)
-            line_height = float(page.height) / len(lines)
-            
-            for line in lines:
-                if line.strip():
-                    word_dict = {
-                        'text': line.strip(),
-                        'bbox': (10, y_position - line_height, float(page.width) - 10, y_position),
-                        'x0': 10,
-                        'top': y_position - line_height,
-                        'x1': float(page.width) - 10,
-                        'bottom': y_position
-                    }
-                    words.append(word_dict)
-                    y_position -= line_height
-                    print(f"تمت إضافة كلمة: {line.strip()}")
-            
-            print(f"تم استخراج {len(words)} كلمة")
-            return words
-            
+            blocks = self.layout_analyzer.analyze(page)
+            logging.debug(f"تم استخراج {len(blocks)} فقرة من الصفحة")
+            return blocks
+
         except Exception as e:
             logging.error(f"خطأ في استخراج الكلمات: {str(e)}")
-            print(f"خطأ في استخراج الكلمات: {str(e)}")
             return []
     
     def create_progress_bar(self, total_pages: int):
         """إنشاء شريط تقدم العملية"""
         try:
+            from tqdm import tqdm
             return tqdm(
                 total=total_pages,
                 desc="تقدم الترجمة",
@@ -1782,7 +1953,8 @@ class PDFHandler:
                 'output_file': str(output_path),
                 'translation_date': datetime.now().isoformat(),
                 'user': 'x9ci',
-                'version': '2.0.0'
+                'version': '2.0.0',
+                'stats': self.run_stats
             }
             
             metadata_path = output_path.with_suffix('.meta.json')
@@ -1808,21 +1980,19 @@ def initialize_system():
     """تهيئة النظام والتحقق من المتطلبات"""
     try:
         # التحقق من وجود المكتبات المطلوبة
-        required_packages = [
-            'pdfplumber',
-            'PyPDF2',
-            'reportlab',
-            'googletrans',
-            'arabic-reshaper',
-            'python-bidi',
-            'tqdm'
-        ]
+        required_packages = {
+            'pdfplumber': 'pdfplumber',
+            'PyPDF2': 'PyPDF2',
+            'reportlab': 'reportlab',
+            'arabic-reshaper': 'arabic_reshaper',
+            'python-bidi': 'bidi',
+            'tqdm': 'tqdm'
+        }
         
-        import importlib.metadata
-        installed_packages = [pkg.metadata['Name'].lower() for pkg in importlib.metadata.distributions()]
-        
-        missing_packages = [pkg for pkg in required_packages 
-                          if pkg.lower() not in installed_packages]
+        # البحث عن الوحدات نفسها دون استيرادها أو فحص كل الحزم المثبتة
+        import importlib.util
+        missing_packages = [package for package, module in required_packages.items()
+                            if importlib.util.find_spec(module) is None]
         
         if missing_packages:
             raise ImportError(
@@ -1860,209 +2030,296 @@ from pathlib import Path
 import logging
 from arabic_handler import ArabicTextHandler
 class TextProcessor:
-    def __init__(self):
-        self.translator = Translator()
-        self.batch_size = 10
+    def __init__(self, translation_memory=None, rate_limiter=None, max_in_flight: int = 4,
+                 backend=None):
+        self.backend = backend or create_backend('google')  # محرك الترجمة المحدد في الإعدادات
+        self.batch_size = 50  # عدد النصوص في كل دفعة (تُجمع في طلبات حسب حد الأحرف)
+        self.src_lang = 'en'
+        self.dest_lang = 'ar'
+        self.backend_name = self.backend.name
+        self.translation_memory = translation_memory  # ذاكرة الترجمة الدائمة (اختيارية)
+        self.pretranslated = {}  # ترجمات النصوص الفريدة من المرور المسبق على المستند
+        self.max_request_chars = self.backend.max_request_chars  # حد الأحرف لكل طلب مجمع
+
+        capabilities = self.backend.capabilities()
+        # محدد المعدل المشترك بدلاً من التأخير الثابت (للمحركات المقيدة فقط)
+        self.rate_limiter = rate_limiter or TokenBucket(rate=2.0, capacity=2)
+        if not capabilities.get('thread_safe', True):
+            max_in_flight = 1
+        self.engine = AsyncTranslationEngine(
+            max_in_flight=max_in_flight,
+            rate_limiter=self.rate_limiter if capabilities.get('rate_limited') else None
+        )
 
     def clean_text(self, text: str) -> str:
         text = re.sub(r'^\d+$', '', text)
-        text = re.sub(r'[^\w\s\-.,?!]', ' ', text)
+        # النقلات تحتفظ برموزها (+ # = /) فلا ينظف إلا النص حولها
+        text = ''.join(
+            part if is_run else re.sub(r'[^\w\s\-.,?!]', ' ', part)
+            for part, is_run in chess_notation.split_runs(text)
+        )
         text = ' '.join(text.split())
         return text.strip()
 
     def is_chess_notation(self, text: str) -> bool:
-        patterns = [
-            r'^[KQRBN]?[a-h]?[1-8]?x?[a-h][1-8](\+|#)?$',
-            r'^O-O(-O)?$',
-            r'^[0-1](/[0-1])?-[0-1](/[0-1])?$',
-            r'\d{1,4}\.',
-            r'½-½',
-        ]
-        return any(bool(re.match(pattern, text.strip())) for pattern in patterns)
+        """الكتلة كلها نقلات شطرنج أو نتيجة مباراة"""
+        return chess_notation.is_move_list(text.strip())
 
     def prepare_arabic_text(self, text: str) -> str:
-        try:
-            reshaped_text = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped_text)
-            return text
-        except Exception as e:
-            logging.error(f"Error preparing Arabic text: {str(e)}")
-            return text
+        # النص يبقى بترتيبه المنطقي، والتشكيل يتم مرة واحدة عند الرسم
+        return text
 
     def process_text_batch(self, texts: List[str]) -> List[str]:
         """معالجة مجموعة من النصوص"""
+        return run_coroutine(self.process_text_batch_async(texts))
+
+    async def process_text_batch_async(self, texts: List[str]) -> List[str]:
+        """معالجة مجموعة من النصوص مع إرسال طلباتها بالتوازي"""
         translated_texts = []
-        arabic_handler = ArabicTextHandler()
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         
-        print(f"معالجة دفعة من {len(texts)} نص")
+        if debug:
+            logging.debug(f"معالجة دفعة من {len(texts)} نص")
         
-        for text in texts:
+        with BATCH_SECONDS.time():
+            raw_translations = await self.translate_texts_async(texts)
+        
+        for text, translated in zip(texts, raw_translations):
             try:
-                if not text or len(text.strip()) < 3:
-                    translated_texts.append("")
+                if not translated:
+                    # None تبقى علامة فشل الترجمة للصفحة
+                    translated_texts.append(translated if translated is None else "")
                     continue
-                    
-                # ترجمة النص
-                translated = self.translator.translate(text, src='en', dest='ar').text
                 
-                # معالجة النص العربي
-                processed_text = arabic_handler.process_arabic_text(translated)
+                # الترجمة تبقى بترتيبها المنطقي، والتشكيل يتم مرة واحدة عند الرسم
+                processed_text = translated
                 translated_texts.append(processed_text)
                 
-                print(f"النص الأصلي: {text}")
-                print(f"الترجمة: {processed_text}")
-                
-                time.sleep(0.5)  # تأخير لتجنب التقييد
+                if debug:
+                    logging.debug(f"النص الأصلي: {text} | الترجمة: {processed_text}")
                 
             except Exception as e:
-                print(f"خطأ في ترجمة النص: {str(e)}")
+                logging.warning(f"خطأ في معالجة النص المترجم: {str(e)}")
                 translated_texts.append("")
         
         return translated_texts
+
+    def translate_texts(self, texts: List[str]) -> List[str]:
+        """ترجمة النصوص عبر ذاكرة الترجمة ثم الطلبات المجمعة"""
+        return run_coroutine(self.translate_texts_async(texts))
+
+    async def translate_texts_async(self, texts: List[str]) -> List[str]:
+        """ترجمة النصوص مع إبقاء نقلات الشطرنج كما هي
+
+        النقلات داخل النص تستبدل برموز مؤقتة فتترجم الجملة كاملة في طلب واحد،
+        ثم تعاد النقلات مكان رموزها.
+        """
+        masked_texts = []
+        notation_runs = []
+        for text in texts:
+            runs = []
+            if text and text not in self.pretranslated:
+                masked, runs = chess_notation.mask(text)
+                if runs:
+                    NOTATION_CHARS_METRIC.inc(sum(len(run) for run in runs))
+                    text = masked if chess_notation.has_prose(masked) else ""
+            masked_texts.append(text)
+            notation_runs.append(runs)
+        
+        translated = await self.translate_plain_async(masked_texts)
+        return [
+            chess_notation.unmask(translation, runs) if runs and translation != "" else translation
+            for translation, runs in zip(translated, notation_runs)
+        ]
+
+    async def translate_plain_async(self, texts: List[str]) -> List[Optional[str]]:
+        """ترجمة النصوص عبر ذاكرة الترجمة ثم الطلبات المجمعة المتوازية (None للنص الذي فشلت ترجمته)"""
+        results = [""] * len(texts)
+        pending = {}  # النص -> فهارس ظهوره في الدفعة
+        
+        for index, text in enumerate(texts):
+            if not text or len(text.strip()) < 3:
+                continue
+            if text in pending:
+                pending[text].append(index)
+                continue
+            cached = self.lookup_translation(text)
+            if cached is None:
+                pending[text] = [index]
+            else:
+                results[index] = cached
+                CACHE_HITS_METRIC.inc()
+        
+        if pending:
+            unique_texts = list(pending)
+            CACHE_MISSES_METRIC.inc(len(unique_texts))
+            CHARS_SENT_METRIC.inc(sum(len(text) for text in unique_texts))
+            translations = await self.translate_batched_async(unique_texts)
+            for text, translated in zip(unique_texts, translations):
+                for index in pending[text]:
+                    results[index] = translated
+                if translated:
+                    self.store_translation(text, translated)
+        
+        if self.translation_memory:
+            self.translation_memory.flush()
+        
+        return results
+
+    async def translate_batched_async(self, texts: List[str]) -> List[str]:
+        """ترجمة عدة نصوص في أقل عدد من الطلبات المتزامنة"""
+        requests = pack_requests(texts, self.max_request_chars, self.backend.max_batch_size)
+        results = await asyncio.gather(*(self.translate_request_async(r) for r in requests))
+        pieces = [piece for request_pieces in results for piece in request_pieces]
+        return merge_chunks(len(texts), pieces)
+
+    async def translate_request_async(self, request: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """إرسال طلب مجمع واحد وتقسيم نتيجته"""
+        try:
+            parts = await self.engine.call(self.translate_raw, [chunk for _, chunk in request])
+            if len(parts) == len(request):
+                return [(index, part) for (index, _), part in zip(request, parts)]
+            logging.warning(f"عدم تطابق أجزاء الطلب المجمع ({len(request)} جزء)، جاري الترجمة فرادى")
+        except BatchMismatchError as e:
+            logging.warning(f"{str(e)}، جاري الترجمة فرادى")
+        except Exception as e:
+            logging.error(f"خطأ في الطلب المجمع: {str(e)}")
+            if len(request) == 1:
+                return [(request[0][0], None)]
+        
+        # الرجوع إلى ترجمة كل جزء على حدة
+        return await asyncio.gather(*(self.translate_chunk_async(index, chunk) for index, chunk in request))
+
+    async def translate_chunk_async(self, index: int, chunk: str) -> Tuple[int, str]:
+        """ترجمة جزء واحد"""
+        try:
+            parts = await self.engine.call(self.translate_raw, [chunk])
+            return index, parts[0]
+        except Exception as e:
+            logging.warning(f"خطأ في ترجمة النص: {str(e)}")
+            return index, None
+
+    def translate_raw(self, texts: List[str]) -> List[str]:
+        """طلب ترجمة واحد من محرك الترجمة"""
+        return self.backend.translate_batch(texts, self.src_lang, self.dest_lang)
+
+    def lookup_translation(self, text: str):
+        """البحث عن ترجمة محفوظة في ذاكرة الترجمة"""
+        if text in self.pretranslated:
+            return self.pretranslated[text]
+        if not self.translation_memory:
+            return None
+        try:
+            return self.translation_memory.get(text, self.src_lang, self.dest_lang, self.backend_name)
+        except Exception as e:
+            logging.warning(f"خطأ في قراءة ذاكرة الترجمة: {str(e)}")
+            return None
+
+    def store_translation(self, text: str, translated: str):
+        """حفظ الترجمة في ذاكرة الترجمة"""
+        if not self.translation_memory:
+            return
+        try:
+            self.translation_memory.put(text, self.src_lang, self.dest_lang, self.backend_name, translated)
+        except Exception as e:
+            logging.warning(f"خطأ في الكتابة إلى ذاكرة الترجمة: {str(e)}")
 # Classes are defined in this file, no need to import them
 import os
 import sys
 
 class ArabicTextHandler:
     def __init__(self):
+        self.font_name = 'Arabic'
         self.font_size = 12
         self.initialize_fonts()
 
     def initialize_fonts(self):
         """تهيئة الخطوط العربية"""
-        try:
-            # قائمة المسارات المحتملة للخطوط
-            current_dir = Path(__file__).parent
-            font_paths = [
-                # الخطوط العربية المتوفرة في النظام
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Khalid.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Petra.ttf",
-                "/usr/share/fonts/truetype/fonts-arabeyes/ae_Salem.ttf",
-                
-                # مسارات محلية احتياطية
-                str(current_dir / "fonts" / "Amiri-Regular.ttf"),
-                str(current_dir / "fonts" / "ae_AlArabiya.ttf"),
-                str(current_dir / "fonts" / "FreeSans.ttf"),
-                
-                # خطوط احتياطية من النظام
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf"
-            ]
-
-            # إنشاء مجلد الخطوط إذا لم يكن موجوداً
-            fonts_dir = current_dir / "fonts"
-            fonts_dir.mkdir(exist_ok=True)
-
-            # محاولة تحميل الخط العربي
-            font_loaded = False
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        if self.font_name not in pdfmetrics.getRegisteredFontNames():
-                            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
-                            print(f"تم تحميل الخط: {font_path}")
-                            font_loaded = True
-                            break
-                    except Exception as e:
-                        print(f"فشل تحميل الخط {font_path}: {str(e)}")
-                        continue
-
-            if not font_loaded:
-                # محاولة نسخ خط عربي من النظام إلى المجلد المحلي
-                system_fonts = [
-                    "/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf",
-                    "/usr/share/fonts/truetype/fonts-arabeyes/ae_Furat.ttf",
-                    "/usr/share/fonts/truetype/fonts-arabeyes/ae_Salem.ttf"
-                ]
-                
-                for system_font in system_fonts:
-                    if os.path.exists(system_font):
-                        dest_path = fonts_dir / Path(system_font).name
-                        try:
-                            shutil.copy2(system_font, dest_path)
-                            pdfmetrics.registerFont(TTFont(self.font_name, str(dest_path)))
-                            print(f"تم نسخ وتحميل الخط: {dest_path}")
-                            font_loaded = True
-                            break
-                        except Exception as e:
-                            print(f"فشل نسخ الخط {system_font}: {str(e)}")
-                            continue
-
-            if not font_loaded:
-                # إذا لم يتم العثور على أي خط، قم بتحميله من الإنترنت
-                print("لم يتم العثور على خط عربي. جاري محاولة التحميل من الإنترنت...")
-                self.download_arabic_font()
-
-        except Exception as e:
-            print(f"خطأ في تهيئة الخطوط: {e}")
-            raise
-
-    def download_arabic_font(self):
-        """تحميل الخط العربي من الإنترنت"""
-        try:
-            import requests
-            # قائمة روابط الخطوط
-            font_urls = [
-                "https://github.com/google/fonts/raw/main/ofl/amiri/Amiri-Regular.ttf",
-                "https://github.com/aerrami/arabic-fonts/raw/master/ae_AlArabiya.ttf"
-            ]
-            
-            fonts_dir = Path(__file__).parent / "fonts"
-            success = False
-            
-            for font_url in font_urls:
-                try:
-                    font_name = Path(font_url).name
-                    font_path = fonts_dir / font_name
-                    
-                    print(f"جاري محاولة تحميل الخط: {font_name}")
-                    response = requests.get(font_url)
-                    response.raise_for_status()
-                    
-                    with open(font_path, 'wb') as f:
-                        f.write(response.content)
-                    
-                    pdfmetrics.registerFont(TTFont(self.font_name, str(font_path)))
-                    print(f"تم تحميل الخط {font_name} بنجاح")
-                    success = True
-                    break
-                    
-                except Exception as e:
-                    print(f"فشل تحميل الخط {font_name}: {str(e)}")
-                    continue
-            
-            if not success:
-                raise Exception("فشل تحميل جميع الخطوط المتاحة")
-                
-        except Exception as e:
-            print(f"خطأ في تحميل الخط العربي: {e}")
-            raise
+        return ensure_arabic_font(self.font_name)
 
     def process_arabic_text(self, text):
         """معالجة النص العربي"""
-        try:
-            # إعادة تشكيل النص العربي
-            reshaped_text = arabic_reshaper.reshape(text)
-            # تطبيق خوارزمية BIDI
-            bidi_text = get_display(reshaped_text)
-            return bidi_text
-        except Exception as e:
-            print(f"خطأ في معالجة النص العربي: {e}")
-            return text
+        return shape_arabic_text(text)
 
     def get_text_dimensions(self, text):
         """حساب أبعاد النص"""
         try:
             processed_text = self.process_arabic_text(text)
-            width = len(processed_text) * self.font_size * 0.6
+            width = string_width(processed_text, self.font_name, self.font_size)
             height = self.font_size * 1.2
             return width, height
         except Exception as e:
-            print(f"خطأ في حساب أبعاد النص: {e}")
+            logging.warning(f"خطأ في حساب أبعاد النص: {e}")
             return 0, 0
     
+def create_pdf_handler(config, worker_count: int = 1, translation_memory=None, rate_limiter=None):
+    """إنشاء مكونات الترجمة من الإعدادات (مع ذاكرة ومحدد معدل مشتركين اختيارياً)"""
+    # تسجيل الخط قبل إنشاء العمليات العاملة حتى ترثه أو تقرأ مساره المحفوظ
+    configure_font_registry(config.FONT_REGISTRY_PATH, config.FONTS_DIR)
+    ensure_arabic_font()
+    if translation_memory is None:
+        translation_memory = TranslationMemory(
+            config.TRANSLATION_MEMORY_PATH,
+            max_entries=config.TRANSLATION_MEMORY_MAX_ENTRIES
+        )
+    if rate_limiter is None:
+        # توزيع حصة الطلبات على العمليات العاملة
+        rate_limiter = TokenBucket(config.REQUESTS_PER_SECOND / max(1, worker_count), config.RATE_LIMIT_BURST)
+    backend = create_backend(config.TRANSLATION_BACKEND, **config.TRANSLATION_BACKEND_OPTIONS)
+    text_processor = TextProcessor(
+        translation_memory,
+        rate_limiter=rate_limiter,
+        max_in_flight=config.MAX_IN_FLIGHT_REQUESTS,
+        backend=backend
+    )
+    page_processor = PageProcessor(text_processor)
+    return PDFHandler(config, page_processor)
+
+def parse_arguments():
+    """قراءة خيارات سطر الأوامر"""
+    import argparse
+    parser = argparse.ArgumentParser(description="ترجمة ملفات PDF إلى العربية")
+    parser.add_argument('input', nargs='?',
+                        help="ملف PDF أو مجلد أو نمط glob (الافتراضي: input/document.pdf)")
+    parser.add_argument('--resume', action='store_true',
+                        help="استئناف مهمة متوقفة وتخطي الصفحات المكتملة")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="عدد الملفات المترجمة معاً في وضع الدفعات")
+    parser.add_argument('--report', default=None,
+                        help="مسار تقرير الدفعة (الافتراضي: output/batch_report_<الوقت>.json)")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="زيادة التفصيل (-v عينة من السجلات التفصيلية، -vv جميعها)")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="عرض التحذيرات والأخطاء فقط")
+    return parser.parse_args()
+
+def run_batch(config, args):
+    """ترجمة كل ملفات PDF في مجلد أو نمط glob وكتابة تقرير بالأزمنة"""
+    files = collect_input_files(args.input)
+    if not files:
+        print(f"لا توجد ملفات PDF في: {args.input}")
+        return
+
+    runner = BatchTranslator(config, create_pdf_handler, jobs=args.jobs or config.BATCH_JOBS)
+    try:
+        print(f"جاري ترجمة {len(files)} ملف...")
+        report = runner.run(files, resume=args.resume)
+        report_path = args.report or (
+            Path(config.OUTPUT_DIR) / f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        runner.write_report(report, report_path)
+    finally:
+        runner.close()
+
+    print(f"\nاكتمل {report['succeeded']} من {report['files']} ملف في {report['total_seconds']:.1f} ثانية")
+    for result in report['results']:
+        if result['status'] != 'ok':
+            print(f"- فشل {Path(result['input']).name}: {result['error']}")
+    print(f"التقرير: {report_path}")
+
 def main():
+    args = parse_arguments()
+    metrics_exporter = None
     try:
         print("تهيئة النظام...")
         
@@ -2071,25 +2328,27 @@ def main():
         for directory in ['input', 'output', 'fonts', 'logs']:
             (current_dir / directory).mkdir(exist_ok=True)
         
-        # إعداد التسجيل
-        log_file = current_dir / "logs" / f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(str(log_file), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
-
         # تهيئة المكونات
         config = PDFTranslatorConfig()
-        text_processor = TextProcessor()
-        page_processor = PageProcessor(text_processor)
-        pdf_handler = PDFHandler(config, page_processor)
+        
+        # إعداد التسجيل (خيارات سطر الأوامر تتقدم على متغيرات البيئة)
+        if args.quiet:
+            config.LOG_VERBOSITY = -1
+        elif args.verbose:
+            config.LOG_VERBOSITY = args.verbose
+        config.setup_logging()
+        if config.METRICS_PATH:
+            metrics_exporter = MetricsExporter(REGISTRY, config.METRICS_PATH, config.METRICS_INTERVAL).start()
+            logging.info(f"تصدير المقاييس إلى: {config.METRICS_PATH}")
+        if args.input and is_batch_source(args.input):
+            run_batch(config, args)
+            return
+        
+        pdf_handler = create_pdf_handler(config)
+        translation_memory = pdf_handler.page_processor.text_processor.translation_memory
         
         # التحقق من ملف الإدخال
-        input_file = current_dir / "input" / "document.pdf"
+        input_file = Path(args.input) if args.input else current_dir / "input" / "document.pdf"
         
         if not input_file.exists():
             print(f"خطأ: الملف غير موجود في: {input_file}")
@@ -2098,6 +2357,7 @@ def main():
                 print("\nالملفات PDF المتوفرة في مجلد input:")
                 for pdf in pdf_files:
                     print(f"- {pdf.name}")
+                print("\nلترجمة جميع الملفات دفعة واحدة: python tran.py input/")
             else:
                 print("\nلا توجد ملفات PDF في مجلد input")
             return
@@ -2106,7 +2366,14 @@ def main():
         print("هذه العملية قد تستغرق بعض الوقت، يرجى الانتظار...")
         
         # بدء عملية الترجمة
-        pdf_handler.translate_pdf(str(input_file))
+        pdf_handler.translate_pdf(str(input_file), resume=args.resume)
+        
+        stats = translation_memory.stats()
+        logging.info(
+            f"ذاكرة الترجمة: {stats['hits']} إصابة، {stats['misses']} إخفاق "
+            f"({stats['hit_rate']:.1%})، {stats['entries']} مدخل"
+        )
+        translation_memory.close()
         
         print("\nتمت الترجمة بنجاح!")
         print(f"يمكنك العثور على الملف المترجم في مجلد: {config.OUTPUT_DIR}")
@@ -2115,26 +2382,10 @@ def main():
         print(f"\nحدث خطأ: {str(e)}")
         logging.error(f"خطأ في البرنامج الرئيسي: {str(e)}")
     finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
         print("\nانتهى البرنامج")
+        stop_logging()
 
 if __name__ == "__main__":
-    # تثبيت المكتبات المطلوبة
-    required_packages = [
-        'arabic-reshaper',
-        'python-bidi',
-        'googletrans==3.1.0a0',
-        'reportlab',
-        'requests',
-        'pdfplumber',
-        'PyPDF2',
-        'tqdm'
-    ]
-    
-    for package in required_packages:
-        try:
-            __import__(package.split('==')[0])
-        except ImportError:
-            print(f"تثبيت حزمة {package}...")
-            os.system(f'pip install {package}')
-    
-    main()
\ No newline at end of file
+    main()
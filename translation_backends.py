@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Translation Backends
+Created: 2025-02-08 14:03:51
+Author: x9ci
+"""
+# translation_backends.py
+
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from batch_translation import BATCH_SEPARATOR, MAX_REQUEST_CHARS, split_response
+
+
+class BatchMismatchError(Exception):
+    """عدد أجزاء الترجمة لا يطابق عدد النصوص المرسلة"""
+
+
+class TranslationBackend:
+    """الواجهة المشتركة لمحركات الترجمة"""
+
+    name = 'base'
+    max_batch_size = 1
+    max_request_chars = MAX_REQUEST_CHARS
+
+    def capabilities(self) -> Dict:
+        """خصائص المحرك: الحاجة للشبكة، التقييد، الأمان بين الخيوط"""
+        return {
+            'network': False,
+            'rate_limited': False,
+            'thread_safe': True,
+            'batch': self.max_batch_size > 1
+        }
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        """ترجمة قائمة نصوص وإرجاع الترجمات بنفس الترتيب"""
+        raise NotImplementedError
+
+
+class GoogleTransBackend(TranslationBackend):
+    """محرك googletrans (غير رسمي ويحتاج الشبكة)"""
+
+    name = 'googletrans'
+    max_batch_size = 50
+
+    def __init__(self, **options):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def capabilities(self) -> Dict:
+        caps = super().capabilities()
+        caps.update({'network': True, 'rate_limited': True})
+        return caps
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        if len(texts) == 1:
+            return [self.translator.translate(texts[0], src=src, dest=dest).text]
+
+        # دمج النصوص في طلب واحد بفاصل الأسطر ثم تقسيم النتيجة
+        response = self.translator.translate(BATCH_SEPARATOR.join(texts), src=src, dest=dest).text
+        parts = split_response(response, texts)
+        if parts is None:
+            raise BatchMismatchError(f"عدم تطابق أجزاء الطلب المجمع ({len(texts)} جزء)")
+        return parts
+
+
+class DictionaryBackend(TranslationBackend):
+    """محرك دون اتصال يعتمد على قاموس محلي (JSON أو TSV)"""
+
+    name = 'dictionary'
+    max_batch_size = 1000
+    max_request_chars = 100000
+    max_phrase_words = 6
+
+    def __init__(self, dictionary_path=None, **options):
+        self.logger = logging.getLogger(__name__)
+        self.entries = {}
+        if dictionary_path:
+            self.load(dictionary_path)
+
+    def load(self, path):
+        """تحميل القاموس من ملف"""
+        path = Path(path)
+        if path.suffix.lower() == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = {}
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if '\t' in line:
+                        source, target = line.rstrip('\n').split('\t', 1)
+                        data[source] = target
+
+        for source, target in data.items():
+            self.entries[self.normalize(source)] = target
+        self.logger.info(f"تم تحميل {len(data)} مدخل من القاموس: {path}")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(text.lower().split())
+
+    def translate_text(self, text: str) -> str:
+        """ترجمة نص بمطابقة أطول عبارة معروفة أولاً"""
+        exact = self.entries.get(self.normalize(text))
+        if exact is not None:
+            return exact
+
+        words = text.split()
+        output = []
+        i = 0
+        while i < len(words):
+            for length in range(min(self.max_phrase_words, len(words) - i), 0, -1):
+                phrase = self.normalize(' '.join(words[i:i + length]).strip('.,?!'))
+                if phrase in self.entries:
+                    output.append(self.entries[phrase])
+                    i += length
+                    break
+            else:
+                # الكلمات غير المعروفة تبقى كما هي
+                output.append(words[i])
+                i += 1
+        return ' '.join(output)
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        return [self.translate_text(text) for text in texts]
+
+
+class ArgosBackend(TranslationBackend):
+    """محرك دون اتصال يشغل نموذج Argos Translate محلياً"""
+
+    name = 'argos'
+    max_batch_size = 32
+    # النموذج المحمل مشترك في العملية وغير آمن بين الخيوط: طلب واحد في كل مرة لكل المحركات
+    _lock = threading.Lock()
+
+    def __init__(self, **options):
+        import argostranslate.translate
+        self.argos = argostranslate.translate
+
+    def capabilities(self) -> Dict:
+        caps = super().capabilities()
+        caps['thread_safe'] = False
+        return caps
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        with self._lock:
+            return [self.argos.translate(text, src, dest) for text in texts]
+
+
+class FakeBackend(TranslationBackend):
+    """محرك وهمي حتمي لاختبارات الأداء"""
+
+    name = 'fake'
+    max_batch_size = 50
+
+    # تحويل الحروف اللاتينية إلى حروف عربية ليمر النص بمعالجة التشكيل
+    LETTERS = str.maketrans(
+        'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ',
+        'ابتثجحخدذرزسشصضطظعغفقكلمنهابتثجحخدذرزسشصضطظعغفقكلمنه'
+    )
+
+    def __init__(self, latency: float = 0.0, **options):
+        self.latency = latency
+        self.requests = 0
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [re.sub(r'\s+', ' ', text.translate(self.LETTERS)).strip() for text in texts]
+
+
+BACKENDS = {
+    'google': GoogleTransBackend,
+    'googletrans': GoogleTransBackend,
+    'dictionary': DictionaryBackend,
+    'argos': ArgosBackend,
+    'fake': FakeBackend,
+}
+
+
+def create_backend(name: str = 'google', **options) -> TranslationBackend:
+    """إنشاء محرك الترجمة المحدد في الإعدادات"""
+    backend_class = BACKENDS.get((name or 'google').lower())
+    if backend_class is None:
+        raise ValueError(f"محرك ترجمة غير معروف: {name}")
+    return backend_class(**options)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Translation Memory Cache
+Created: 2025-02-03 10:14:37
+Author: x9ci
+"""
+# translation_cache.py
+
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class TranslationMemory:
+    """ذاكرة ترجمة دائمة على القرص مع إخلاء LRU محدود الحجم
+
+    القراءة لا تكتب في قاعدة البيانات: تحديثات وقت الاستخدام والترجمات الجديدة
+    تجمع في الذاكرة وتكتب في معاملة قصيرة واحدة، فلا يبقى قفل الكتابة مفتوحاً
+    أثناء انتظار طلبات الترجمة وتستطيع العمليات الأخرى الكتابة في الملف نفسه.
+    """
+
+    COMMIT_EVERY = 50
+
+    def __init__(self, db_path, max_entries: int = 200000):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[str, float] = {}  # المفتاح ← آخر استخدام لم يكتب بعد
+        self._pending: Dict[str, tuple] = {}  # المفتاح ← صف ترجمة جديد لم يكتب بعد
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS memory (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON memory(last_used)")
+        self.conn.commit()
+        self._count = self.conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """توحيد النص قبل حساب المفتاح"""
+        text = unicodedata.normalize('NFC', text or '')
+        return ' '.join(text.split())
+
+    def make_key(self, text: str, src: str, dest: str, backend: str) -> str:
+        """إنشاء مفتاح فريد للنص واللغتين والمحرك"""
+        raw = '\x1f'.join([self.normalize_text(text), src, dest, backend])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text: str, src: str, dest: str, backend: str) -> Optional[str]:
+        """البحث عن ترجمة محفوظة"""
+        key = self.make_key(text, src, dest, backend)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.hits += 1
+                return pending[5]
+
+            row = self.conn.execute(
+                "SELECT translation FROM memory WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._touched[key] = time.time()
+            self._mark_write()
+            return row[0]
+
+    def put(self, text: str, src: str, dest: str, backend: str, translation: str):
+        """حفظ ترجمة جديدة في الذاكرة"""
+        if not translation:
+            return
+
+        key = self.make_key(text, src, dest, backend)
+        with self._lock:
+            self._pending[key] = (
+                key, self.normalize_text(text), src, dest, backend, translation, time.time()
+            )
+            self._touched.pop(key, None)
+            self._mark_write()
+
+    def _evict_if_needed(self):
+        """إخلاء أقدم المدخلات استخداماً عند تجاوز الحد"""
+        overflow = self._count - self.max_entries
+        if overflow <= 0:
+            return
+
+        self.conn.execute(
+            "DELETE FROM memory WHERE key IN "
+            "(SELECT key FROM memory ORDER BY last_used ASC LIMIT ?)",
+            (overflow,)
+        )
+        self._count -= overflow
+        self.logger.debug(f"تم إخلاء {overflow} مدخل من ذاكرة الترجمة")
+
+    def _mark_write(self):
+        if len(self._touched) + len(self._pending) >= self.COMMIT_EVERY:
+            self._write_pending()
+
+    def _write_pending(self):
+        """كتابة التغييرات المجمعة في معاملة قصيرة واحدة (مع الاحتفاظ بالقفل الداخلي)"""
+        if not self._touched and not self._pending:
+            return
+        count_before = self._count
+        try:
+            with self.conn:
+                if self._touched:
+                    self.conn.executemany(
+                        "UPDATE memory SET last_used = ? WHERE key = ?",
+                        [(used, key) for key, used in self._touched.items()]
+                    )
+                if self._pending:
+                    for key in self._pending:
+                        if self.conn.execute("SELECT 1 FROM memory WHERE key = ?", (key,)).fetchone() is None:
+                            self._count += 1
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        list(self._pending.values())
+                    )
+                    self._evict_if_needed()
+        except sqlite3.OperationalError as e:
+            # قاعدة البيانات مشغولة بعملية أخرى: تبقى التغييرات معلقة للمحاولة التالية
+            self._count = count_before
+            self.logger.warning(f"تأجيل الكتابة في ذاكرة الترجمة: {str(e)}")
+            return
+        self._touched.clear()
+        self._pending.clear()
+
+    def flush(self):
+        """حفظ التغييرات المعلقة على القرص"""
+        with self._lock:
+            self._write_pending()
+
+    def stats(self) -> Dict:
+        """إحصائيات الإصابة والإخفاق"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'entries': self._count,
+            'max_entries': self.max_entries
+        }
+
+    def export_jsonl(self, path) -> int:
+        """تصدير الذاكرة بصيغة JSON Lines"""
+        self.flush()
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            rows = self.conn.execute(
+                "SELECT source, src, dest, backend, translation FROM memory ORDER BY last_used"
+            )
+            for source, src, dest, backend, translation in rows:
+                f.write(json.dumps({
+                    'source': source,
+                    'src': src,
+                    'dest': dest,
+                    'backend': backend,
+                    'translation': translation
+                }, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    def import_jsonl(self, path) -> int:
+        """استيراد مدخلات من ملف JSON Lines"""
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self.put(entry['source'], entry['src'], entry['dest'],
+                             entry['backend'], entry['translation'])
+                    count += 1
+                except (ValueError, KeyError) as e:
+                    self.logger.warning(f"سطر غير صالح {line_num} في {path}: {str(e)}")
+        self.flush()
+        return count
+
+    def close(self):
+        """إغلاق قاعدة البيانات"""
+        try:
+            self.flush()
+            self.conn.close()
+        except Exception as e:
+            self.logger.warning(f"خطأ في إغلاق ذاكرة الترجمة: {str(e)}")
+
+
+if __name__ == "__main__":
+    # python translation_cache.py export|import|stats <db> [file.jsonl]
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'import', 'stats'):
+        print("الاستخدام: translation_cache.py export|import|stats <db> [file.jsonl]")
+        sys.exit(1)
+
+    memory = TranslationMemory(sys.argv[2])
+    try:
+        if sys.argv[1] == 'export':
+            print(f"تم تصدير {memory.export_jsonl(sys.argv[3])} مدخل")
+        elif sys.argv[1] == 'import':
+            print(f"تم استيراد {memory.import_jsonl(sys.argv[3])} مدخل")
+        else:
+            print(json.dumps(memory.stats(), ensure_ascii=False, indent=2))
+    finally:
+        memory.close()